@@ -1,37 +1,140 @@
-import queue
-import networkx as nx
-import matplotlib.pyplot as plt
+from collections import deque
+
+from domains import MASK_VALUES, is_single, mask_to_set, popcount, value_bit, values_to_mask
+from grid import NINE, board_geometry
+from limits import SearchAborted
+from tracing import FULL, SUMMARY, as_trace
+
+# ac3 checks its limits once per this many revise calls
+LIMITS_EVERY = 256
+
+
+class ArcTable:
+    """Every binary not-equal arc (Xi, Xj) of one board size, as ids i * peers + position of j.
+
+    Arcs only join peers, so there are cells * peers of them, never cells².
+    requeue[arc_id] lists the arcs to re-check after revising that arc:
+    (Xk, Xi) for every peer k of Xi except Xj. It is built in full for 9x9
+    and filled in on first use for larger boards.
+    """
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+        peers = geometry.peers
+        self.width = len(peers[0])
+        self.arcs = [(i, j) for i in geometry.cells for j in peers[i]]
+        self.peer_position = [{j: p for p, j in enumerate(peers[i])} for i in geometry.cells]
+        if geometry is NINE:
+            self.requeue = [self.incoming(arc_id) for arc_id in range(len(self.arcs))]
+        else:
+            self.requeue = LazyRequeue(self)
+
+    def index(self, i, j):
+        return i * self.width + self.peer_position[i][j]
+
+    def incoming(self, arc_id):
+        i, j = self.arcs[arc_id]
+        return tuple(self.index(k, i) for k in self.geometry.peers[i] if k != j)
+
+
+class LazyRequeue(dict):
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+
+    def __missing__(self, arc_id):
+        arc_ids = self.table.incoming(arc_id)
+        self[arc_id] = arc_ids
+        return arc_ids
+
+
+_ARC_TABLES = {}
+
+
+def arc_table(geometry):
+    """Shared ArcTable for a grid.Geometry."""
+    if geometry.box not in _ARC_TABLES:
+        _ARC_TABLES[geometry.box] = ArcTable(geometry)
+    return _ARC_TABLES[geometry.box]
+
+
+NINE_ARCS = arc_table(NINE)
+# The 9x9 tables: every arc, the id of each arc and the arcs to re-check after revising it
+ARCS = NINE_ARCS.arcs
+ARC_INDEX = {arc: arc_id for arc_id, arc in enumerate(ARCS)}
+REQUEUE = NINE_ARCS.requeue
 
 def initialize_domains(board):
+    size = len(board)
     domain = []
-    for r in range(9):
+    for r in range(size):
         row = []
-        for c in range(9):
+        for c in range(size):
             if board[r][c] == 0:
-                row.append({1, 2, 3, 4, 5, 6, 7, 8, 9})
+                row.append(set(range(1, size + 1)))
             else:
                 row.append({board[r][c]})
         domain.append(row)
     return domain
 
 
+def initialize_bit_domains(board):
+    """Like initialize_domains, but each cell's domain is a bitmask."""
+    all_values = board_geometry(board).all_values
+    return [[all_values if value == 0 else value_bit(value) for value in row] for row in board]
+
+
+def domains_to_bits(domain):
+    return [[values_to_mask(cell) for cell in row] for row in domain]
+
+
+def bits_to_domains(masks):
+    return [[mask_to_set(mask) for mask in row] for row in masks]
+
+
+class ArcQueue:
+    """Lock-free FIFO worklist of arcs that ignores arcs already pending.
+
+    Arcs are kept as ids into an ArcTable (9x9 by default); put/get/empty
+    mirror queue.Queue and use the ((row, col), (row, col)) form.
+    """
+
+    def __init__(self, arc_ids=(), table=NINE_ARCS):
+        self.table = table
+        self.items = deque()
+        self.pending = bytearray(len(table.arcs))
+        for arc_id in arc_ids:
+            self.push(arc_id)
+
+    def push(self, arc_id):
+        if not self.pending[arc_id]:
+            self.pending[arc_id] = 1
+            self.items.append(arc_id)
+
+    def pop(self):
+        arc_id = self.items.popleft()
+        self.pending[arc_id] = 0
+        return arc_id
+
+    def put(self, arc):
+        (rowi, coli), (rowj, colj) = arc
+        geometry = self.table.geometry
+        self.push(self.table.index(geometry.index(rowi, coli), geometry.index(rowj, colj)))
+
+    def get(self):
+        i, j = self.table.arcs[self.pop()]
+        return self.table.geometry.pos(i), self.table.geometry.pos(j)
+
+    def empty(self):
+        return not self.items
+
+    def __len__(self):
+        return len(self.items)
+
+
 def define_arcs(board):
-    arcs = queue.Queue()
-    for row in range(9):
-        for col in range(9):
-            for j in range(9):
-                if j != col:
-                    arcs.put(((row, col), (row, j)))
-            for i in range(9):
-                if i != row:
-                    arcs.put(((row, col), (i, col)))
-            box_x = col // 3
-            box_y = row // 3
-            for i in range(box_y * 3, box_y * 3 + 3):
-                for j in range(box_x * 3, box_x * 3 + 3):
-                    if i != row and j != col:
-                        arcs.put(((row, col), (i, j)))
-    return arcs
+    table = arc_table(board_geometry(board))
+    return ArcQueue(range(len(table.arcs)), table)
 
 
 def revise(domaini, domainj):
@@ -47,21 +150,32 @@ def revise(domaini, domainj):
     return revised, dom
 
 
-def neighbours(rowi, coli, rowj, colj):
-    neighbours = queue.Queue()
-    for j in range(9):
-        if j != coli and j != colj:
-            neighbours.put(((rowi, coli), (rowi, j)))
-    for i in range(9):
-        if i != rowi and i != rowj:
-            neighbours.put(((rowi, coli), (i, coli)))
-    box_x = coli // 3
-    box_y = rowi // 3
-    for i in range(box_y * 3, box_y * 3 + 3):
-        for j in range(box_x * 3, box_x * 3 + 3):
-            if i != rowi and j != coli and i != rowj and j != colj:
-                neighbours.put(((rowi, coli), (i, j)))
-    return neighbours
+def revise_bits(maski, maskj):
+    """Bitmask revise: a value of Xi loses its support only when Xj is that single value."""
+    if is_single(maskj) and maski & maskj:
+        return True, maski & ~maskj
+    return False, maski
+
+
+def format_revision(i, j, old_mask, maskj, new_mask, geometry=NINE):
+    """Trace text for one revision of arc (Xi, Xj)."""
+    (rowi, coli), (rowj, colj) = geometry.pos(i), geometry.pos(j)
+    before = mask_to_set(old_mask)
+    after = mask_to_set(new_mask)
+    lines = [f"Revising arc (X{rowi}{coli}, X{rowj}{colj})",
+             f"Current domain of X{rowi}{coli}: {before}",
+             f"Domain of X{rowj}{colj}: {mask_to_set(maskj)}"]
+    for r in before - after:
+        lines.append(f"Removed value {r} from X{rowi}{coli} because no supporting value exists in X{rowj}{colj}")
+    lines.append(f"Updated domain of X{rowi}{coli}: {after}\n\n\n")
+    return "\n".join(lines)
+
+
+def neighbours(rowi, coli, rowj, colj, geometry=NINE):
+    """Arcs to re-check once the domain of Xi changed while revising (Xi, Xj), on a board of geometry."""
+    table = arc_table(geometry)
+    arc_id = table.index(geometry.index(rowi, coli), geometry.index(rowj, colj))
+    return [(geometry.pos(k), geometry.pos(i)) for k, i in (table.arcs[n] for n in table.requeue[arc_id])]
 
 def print_subtree(arc_tree, start_node, prefix="", visited=None, is_last=True):
     """
@@ -144,7 +258,11 @@ def print_arc_tree(arc_tree, arc=None, prefix="", visited=None, is_last=True):
         print_arc_tree(arc_tree, child, new_prefix, visited, is_last_child)
 
 
-def visualize_arc_tree(arc_tree):
+def visualize_arc_tree(arc_tree, block=True):
+    """Draw the tree with networkx/matplotlib, which are only imported here."""
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     G = nx.DiGraph()  # Directed graph for tree structure
 
     # Add edges to the graph
@@ -167,55 +285,224 @@ def visualize_arc_tree(arc_tree):
 
     # Show the plot
     plt.title("Arc Consistency Tree")
-    plt.show()
-
-
-
-def ac3(board, domain, arcs, filename="log.txt"):
-    arc_tree = {}  # Tracks which arc caused others to be added
-    revised_any = False  # Track if any revision occurred
-
-    while not arcs.empty():
-        with open(filename, "a") as f:
-            ((rowi, coli), (rowj, colj)) = arcs.get()
-            current_arc = ((rowi, coli), (rowj, colj))
-
-            rev, dom = revise(domain[rowi][coli], domain[rowj][colj])
-            if rev:
-                revised_any = True
-                print(f"Revising arc (X{rowi}{coli}, X{rowj}{colj})")
-                f.write(f"Revising arc (X{rowi}{coli}, X{rowj}{colj})\n")
-                print(f"Current domain of X{rowi}{coli}: {domain[rowi][coli]}")
-                f.write(f"Current domain of X{rowi}{coli}: {domain[rowi][coli]}\n")
-                print(f"Domain of X{rowj}{colj}: {domain[rowj][colj]}")
-                f.write(f"Domain of X{rowj}{colj}: {domain[rowj][colj]}\n")
-                removed = domain[rowi][coli] - dom
-                for r in removed:
-                    print(f"Removed value {r} from X{rowi}{coli} because no supporting value exists in X{rowj}{colj}")
-                    f.write(f"Removed value {r} from X{rowi}{coli} because no supporting value exists in X{rowj}{colj}\n")
-                print(f"Updated domain of X{rowi}{coli}: {dom}\n")
-                f.write(f"Updated domain of X{rowi}{coli}: {dom}\n\n\n")
-                domain[rowi][coli] = dom
-                if not domain[rowi][coli]:
-                    return False
-
-                neighbour = neighbours(rowi, coli, rowj, colj)
-                arc_tree.setdefault(current_arc, [])
-                while not neighbour.empty():
-                    n = neighbour.get()
-                    arcs.put(n)
-                    arc_tree[current_arc].append(n)
+    plt.show(block=block)
 
-            else:
-                # Still record arc in tree (for completeness, even if it caused no new arcs)
-                arc_tree.setdefault(current_arc, [])
 
-        f.close()
 
-    print("\nArc Consistency Tree:")
-    if revised_any:
-        print_arc_tree(arc_tree)
-        visualize_arc_tree(arc_tree)  # Visualize the tree
-    else:
-        print("No revisions made, tree is empty.")
-    return domain
+def ac3(board, domain, arcs, filename="log.txt", trace=None, arc_tree=None, stats=None, limits=None):
+    """Enforce arc consistency on domain (sets or bitmasks); return it pruned, or False on wipe-out.
+
+    trace is a tracing.TraceSink or a level name ("off", "summary", "full");
+    with the default (off) the loop does no I/O at all. Pass a dict as
+    arc_tree to have it filled with which arc caused others to be added,
+    for print_arc_tree / visualize_arc_tree; it is not built otherwise.
+    Revise calls, pruned values and wipe-outs are added to stats (a
+    metrics.SearchStats) when one is given. limits (a limits.Limits) is
+    checked every LIMITS_EVERY revise calls; SearchAborted is raised when it
+    is hit, after the stats so far are added, since domains pruned only part
+    of the way are not arc consistent (see limits.py).
+    """
+    trace = as_trace(trace, filename)
+    full = trace.enabled(FULL)
+    diagnostics = arc_tree is not None
+    revisions = 0
+    revise_calls = 0
+    pruned = 0
+    geometry = board_geometry(board)
+    table = arc_table(geometry)
+    all_arcs, requeue, pos = table.arcs, table.requeue, geometry.pos
+    as_sets = isinstance(domain[0][0], set)
+    masks = [mask for row in (domains_to_bits(domain) if as_sets else domain) for mask in row]
+    if not isinstance(arcs, ArcQueue):
+        pending = ArcQueue(table=table)
+        while not arcs.empty():
+            pending.put(arcs.get())
+        arcs = pending
+
+    while arcs:
+        arc_id = arcs.pop()
+        i, j = all_arcs[arc_id]
+        revise_calls += 1
+        if limits is not None and not revise_calls % LIMITS_EVERY:
+            status = limits.reason()
+            if status is not None:
+                if stats is not None:
+                    stats.revise_calls += revise_calls
+                    stats.values_pruned += pruned
+                raise SearchAborted(status)
+
+        rev, mask = revise_bits(masks[i], masks[j])
+        if rev:
+            revisions += 1
+            pruned += popcount(masks[i]) - popcount(mask)
+            if full:
+                trace.write(format_revision(i, j, masks[i], masks[j], mask, geometry))
+            masks[i] = mask
+            if not mask:
+                if stats is not None:
+                    stats.revise_calls += revise_calls
+                    stats.values_pruned += pruned
+                    stats.wipeouts += 1
+                row, col = pos(i)
+                trace.write(f"AC-3 wipe-out at X{row}{col} after {revisions} revisions\n")
+                trace.flush()
+                return False
+
+            for n in requeue[arc_id]:
+                arcs.push(n)
+            if diagnostics:
+                current_arc = (pos(i), pos(j))
+                arc_tree.setdefault(current_arc, []).extend(
+                    (pos(all_arcs[n][0]), current_arc[0]) for n in requeue[arc_id])
+
+        elif diagnostics:
+            # Still record arc in tree (for completeness, even if it caused no new arcs)
+            arc_tree.setdefault((pos(i), pos(j)), [])
+
+    if stats is not None:
+        stats.revise_calls += revise_calls
+        stats.values_pruned += pruned
+    if trace.enabled(SUMMARY):
+        trace.write(f"AC-3 finished: {revisions} revisions, {sum(map(popcount, masks))} values left\n")
+        trace.flush()
+    size = geometry.size
+    rows = [masks[r * size:r * size + size] for r in range(size)]
+    return bits_to_domains(rows) if as_sets else rows
+
+
+def _augment(x, masks, owner, seen, mask_values):
+    """Kuhn augmenting path from variable x; owner[value] is the variable matched to value."""
+    for value in mask_values[masks[x]]:
+        if value in seen:
+            continue
+        seen.add(value)
+        y = owner[value]
+        if y < 0 or _augment(y, masks, owner, seen, mask_values):
+            owner[value] = x
+            return True
+    return False
+
+
+def _components(edges):
+    """Strongly connected component id of every node of a small directed graph (Tarjan)."""
+    n = len(edges)
+    index = [-1] * n
+    low = [0] * n
+    comp = [-1] * n
+    stack = []
+    counter = [0, 0]  # next dfs index, next component id
+
+    def visit(x):
+        index[x] = low[x] = counter[0]
+        counter[0] += 1
+        stack.append(x)
+        for y in edges[x]:
+            if index[y] < 0:
+                visit(y)
+                low[x] = min(low[x], low[y])
+            elif comp[y] < 0:
+                low[x] = min(low[x], index[y])
+        if low[x] == index[x]:
+            while True:
+                y = stack.pop()
+                comp[y] = counter[1]
+                if y == x:
+                    break
+            counter[1] += 1
+
+    for x in range(n):
+        if index[x] < 0:
+            visit(x)
+    return comp
+
+
+def filter_alldiff(masks, mask_values=MASK_VALUES):
+    """Régin's filter for one all-different unit of n cells over the values 1-n.
+
+    Returns the masks with every value that belongs to no perfect matching of
+    cells to values removed, or None if there is no perfect matching at all.
+    With a perfect matching mate, value mate[y] is usable by cell x exactly
+    when x and y lie on a common cycle of the graph x -> y for mate[y] in x's
+    domain, i.e. in the same strongly connected component.
+    """
+    owner = [-1] * (len(masks) + 1)
+    for x in range(len(masks)):
+        if not _augment(x, masks, owner, set(), mask_values):
+            return None
+    mate = [0] * len(masks)
+    for value in range(1, len(masks) + 1):
+        if owner[value] >= 0:
+            mate[owner[value]] = value_bit(value)
+    edges = [[y for y in range(len(masks)) if y != x and masks[x] & mate[y]] for x in range(len(masks))]
+    comp = _components(edges)
+    comp_values = {}
+    for x, c in enumerate(comp):
+        comp_values[c] = comp_values.get(c, 0) | mate[x]
+    return [mask & comp_values[comp[x]] for x, mask in enumerate(masks)]
+
+
+def gac(board, domain, filename="log.txt", trace=None, stats=None, limits=None):
+    """Generalized arc consistency on the all-different units (27 of them on a 9x9 board).
+
+    Same input and output as ac3 (sets or bitmasks in, the same kind out, or
+    False on wipe-out), but each row, column and box is filtered as one
+    constraint with filter_alldiff, which also catches pairs, triples and
+    hidden singles that binary arcs never see. Units are re-filtered whenever
+    one of their cells loses a value, until nothing changes. Unit filterings
+    are counted as revise calls in stats. limits is checked before every
+    unit filtering, as in ac3.
+    """
+    trace = as_trace(trace, filename)
+    full = trace.enabled(FULL)
+    geometry = board_geometry(board)
+    units = geometry.units
+    as_sets = isinstance(domain[0][0], set)
+    masks = [mask for row in (domains_to_bits(domain) if as_sets else domain) for mask in row]
+    pending = deque(range(len(units)))
+    queued = [True] * len(units)
+    filterings = 0
+    pruned = 0
+
+    while pending:
+        unit_id = pending.popleft()
+        queued[unit_id] = False
+        unit = units[unit_id]
+        filterings += 1
+        if limits is not None:
+            status = limits.reason()
+            if status is not None:
+                if stats is not None:
+                    stats.revise_calls += filterings
+                    stats.values_pruned += pruned
+                raise SearchAborted(status)
+        filtered = filter_alldiff([masks[k] for k in unit], geometry.mask_values)
+        if filtered is None:
+            if stats is not None:
+                stats.revise_calls += filterings
+                stats.values_pruned += pruned
+                stats.wipeouts += 1
+            trace.write(f"GAC wipe-out in unit {unit_id} after {filterings} unit filterings\n")
+            trace.flush()
+            return False
+        for k, mask in zip(unit, filtered):
+            if mask == masks[k]:
+                continue
+            pruned += popcount(masks[k]) - popcount(mask)
+            if full:
+                trace.write(f"Unit {unit_id}: X{geometry.row_of[k]}{geometry.col_of[k]} "
+                            f"{mask_to_set(masks[k])} -> {mask_to_set(mask)}\n")
+            masks[k] = mask
+            for other in geometry.units_of[k]:
+                if not queued[other] and other != unit_id:
+                    queued[other] = True
+                    pending.append(other)
+
+    if stats is not None:
+        stats.revise_calls += filterings
+        stats.values_pruned += pruned
+    if trace.enabled(SUMMARY):
+        trace.write(f"GAC finished: {filterings} unit filterings, {sum(map(popcount, masks))} values left\n")
+        trace.flush()
+    size = geometry.size
+    rows = [masks[r * size:r * size + size] for r in range(size)]
+    return bits_to_domains(rows) if as_sets else rows
@@ -0,0 +1,164 @@
+"""Candidate masks and single-candidate fills for many boards at once, with NumPy.
+
+Boards are rows of an (N, cells) integer array (81, 256 or 625 columns,
+0 = empty). Every step is a whole-array reduction over the row, column and
+box index tables of grid.Geometry, so a batch of easy puzzles is cleared
+without a Python loop per cell or per board. Only the boards left open go on
+to the scalar search.
+
+NumPy is only needed by this module; importing it without NumPy works, and
+the functions raise ImportError when called.
+"""
+from math import isqrt
+
+from grid import SYMBOLS, geometry
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# presolve statuses
+OPEN = 0
+SOLVED = 1
+INVALID = 2
+
+_TABLES = {}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("batch.py needs NumPy: pip install numpy")
+
+
+def _tables(box):
+    """(geometry, units, units_of, bit of each value 0..size) as arrays, built once per size."""
+    if box not in _TABLES:
+        shape = geometry(box)
+        # 16-bit masks up to 16x16, 32-bit for 25x25
+        dtype = np.uint16 if shape.size <= 16 else np.uint32
+        bit_of = np.array([0] + [1 << (value - 1) for value in range(1, shape.size + 1)], dtype=dtype)
+        _TABLES[box] = (shape, np.array(shape.units, dtype=np.intp), np.array(shape.units_of, dtype=np.intp),
+                        bit_of)
+    return _TABLES[box]
+
+
+def as_boards(boards):
+    """boards as a 2-D uint8 array, checking the width is 81, 256 or 625."""
+    _require_numpy()
+    boards = np.asarray(boards, dtype=np.uint8)
+    if boards.ndim == 1:
+        boards = boards.reshape(1, -1)
+    size = isqrt(boards.shape[1])
+    box = isqrt(size)
+    if boards.ndim != 2 or size * size != boards.shape[1] or box * box != size or not 3 <= box <= 5:
+        raise ValueError(f"Expected boards of 81, 256 or 625 cells, got shape {boards.shape}")
+    return boards
+
+
+def _unit_counts(unit_masks):
+    """(values in at least one, values in at least two) of the masks along the last axis."""
+    once = np.zeros(unit_masks.shape[:-1], dtype=unit_masks.dtype)
+    twice = np.zeros_like(once)
+    for k in range(unit_masks.shape[-1]):
+        mask = unit_masks[..., k]
+        twice |= once & mask
+        once |= mask
+    return once, twice
+
+
+def _analyse(boards, box):
+    """(candidate masks, unit masks, inconsistent rows) of a uint8 board array."""
+    shape, units, units_of, bit_of = _tables(box)
+    # Out-of-range values are flagged below; clamp them so the lookup stays in bounds
+    bits = bit_of[np.minimum(boards, shape.size)]
+    used, repeated = _unit_counts(bits[:, units])
+    clash = (repeated != 0).any(axis=1) | (boards > shape.size).any(axis=1)
+    candidates = bit_of.dtype.type(shape.all_values) & ~(used[:, units_of[:, 0]] | used[:, units_of[:, 1]]
+                                                         | used[:, units_of[:, 2]])
+    candidates = np.where(boards == 0, candidates, bits)
+    return candidates, used, clash
+
+
+def candidate_masks(boards):
+    """(N, cells) bitmask domains as solver.initialize_domains builds them, and a per-board conflict flag.
+
+    A filled cell's mask is its own value's bit; an empty cell's holds the
+    values no peer uses. Conflicting boards (a value repeated in a unit, or
+    out of range) are flagged rather than raising.
+    """
+    boards = as_boards(boards)
+    box = isqrt(isqrt(boards.shape[1]))
+    candidates, _, clash = _analyse(boards, box)
+    return candidates, clash
+
+
+def presolve(boards):
+    """Fill naked and hidden singles in every board until none are left; returns (boards, status).
+
+    boards is a filled copy of the input and status holds SOLVED, OPEN or
+    INVALID per board. INVALID boards have a repeated value, a cell with no
+    candidate, or a value with no place left in some unit. OPEN boards need a
+    search; the singles filled in are forced, so searching the filled board
+    gives the same solutions as the original.
+    """
+    boards = as_boards(boards).copy()
+    box = isqrt(isqrt(boards.shape[1]))
+    shape, units, units_of, _ = _tables(box)
+    status = np.full(len(boards), OPEN, dtype=np.int8)
+    active = np.arange(len(boards))
+    while active.size:
+        current = boards[active]
+        empty = current == 0
+        candidates, used, bad = _analyse(current, box)
+        candidates = np.where(empty, candidates, 0).astype(candidates.dtype)
+        bad |= (empty & (candidates == 0)).any(axis=1)
+        # Per unit, the values some empty cell could take and those more than one could
+        seen, shared = _unit_counts(candidates[:, units])
+        bad |= ((shape.all_values & ~(seen | used)) != 0).any(axis=1)
+        solved = ~empty.any(axis=1) & ~bad
+
+        # Hidden singles: values with a single place in one of the cell's units
+        hidden = seen & ~shared
+        forced = candidates & (hidden[:, units_of[:, 0]] | hidden[:, units_of[:, 1]] | hidden[:, units_of[:, 2]])
+        # A cell that is the only place for two values is a contradiction
+        bad |= (forced & (forced - 1) != 0).any(axis=1)
+        # Otherwise naked singles: the cell's only candidate
+        forced = np.where(forced != 0, forced, candidates)
+        single = (forced != 0) & (forced & (forced - 1) == 0)
+        # The exponent of a one-bit mask is its value
+        fills = np.where(single, np.frexp(forced)[1], 0).astype(np.uint8)
+
+        boards[active] = np.where(single, fills, current)
+        status[active[bad]] = INVALID
+        status[active[solved]] = SOLVED
+        active = active[single.any(axis=1) & ~bad]
+    return boards, status
+
+
+def unresolved(boards):
+    """(indices, filled boards) of the boards presolve leaves OPEN, for the scalar search."""
+    filled, status = presolve(boards)
+    indices = np.flatnonzero(status == OPEN)
+    return indices, filled[indices]
+
+
+def lines_to_boards(lines):
+    """uint8 board array from equal-length puzzle lines ('0' or '.' blank, A-P above 9).
+
+    Any other character, including a symbol above the board's size ('A' on a
+    9x9 board), becomes a value no board can hold, so presolve marks it INVALID.
+    """
+    _require_numpy()
+    size = isqrt(len(lines[0])) if lines else 0
+    codes = np.full(256, 255, dtype=np.uint8)
+    codes[[ord("0"), ord(".")]] = 0
+    for value, symbol in enumerate(SYMBOLS[:size], 1):
+        codes[[ord(symbol), ord(symbol.lower())]] = value
+    text = np.frombuffer("".join(lines).encode("ascii", "replace"), dtype=np.uint8)
+    return as_boards(codes[text].reshape(len(lines), -1))
+
+
+def board_line(row):
+    """Puzzle line of one board array row."""
+    return "".join(SYMBOLS[value - 1] if value else "0" for value in row.tolist())
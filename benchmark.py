@@ -0,0 +1,83 @@
+"""Headless benchmark of the solver strategies on the bundled puzzle corpus.
+
+    python cli.py bench --json results.json
+"""
+import json
+import math
+import os
+import statistics
+import time
+
+import solver
+from bulk import puzzle_lines
+from grid import parse_board
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzles")
+CATEGORIES = ("easy", "medium", "hard", "adversarial")
+COLUMNS = ("category", "strategy", "puzzles", "solved", "nodes", "backtracks", "propagations",
+           "median_ms", "p99_ms", "puzzles_per_sec")
+
+
+def load_corpus(category, corpus_dir=CORPUS_DIR):
+    with open(os.path.join(corpus_dir, f"{category}.txt")) as f:
+        return [parse_board(line) for line in puzzle_lines(f)]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def bench_strategy(heuristic, boards, repeat=1):
+    """Solve every board repeat times; return one row (counts are totals over the boards, per pass)."""
+    times = []
+    solved = nodes = backtracks = propagations = 0
+    for _ in range(repeat):
+        for board in boards:
+            start_time = time.perf_counter()
+            result = solver.solve(board, heuristic)
+            times.append(time.perf_counter() - start_time)
+            solved += result.solved
+            nodes += result.stats.nodes
+            backtracks += result.stats.backtracks
+            propagations += result.stats.values_pruned
+    times.sort()
+    runs = len(times)
+    return {
+        "strategy": heuristic,
+        "puzzles": len(boards),
+        "solved": solved // repeat,
+        "nodes": nodes // repeat,
+        "backtracks": backtracks // repeat,
+        "propagations": propagations // repeat,
+        "median_ms": statistics.median(times) * 1000,
+        "p99_ms": percentile(times, 0.99) * 1000,
+        "puzzles_per_sec": runs / sum(times) if sum(times) else float("inf"),
+    }
+
+
+def run_benchmark(strategies=solver.HEURISTICS, categories=CATEGORIES, repeat=1, corpus_dir=CORPUS_DIR):
+    """One result row per (strategy, category)."""
+    rows = []
+    for category in categories:
+        boards = load_corpus(category, corpus_dir)
+        for heuristic in strategies:
+            rows.append({"category": category, **bench_strategy(heuristic, boards, repeat)})
+    return rows
+
+
+def format_table(rows):
+    cells = [[f"{row[column]:.3f}" if isinstance(row[column], float) else str(row[column])
+              for column in COLUMNS] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(COLUMNS)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(COLUMNS, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    for line in cells:
+        lines.append("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+    return "\n".join(lines)
+
+
+def write_json(rows, path):
+    with open(path, "w") as f:
+        json.dump(rows, f, indent=2)
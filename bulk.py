@@ -0,0 +1,170 @@
+"""Solve many puzzles from a line-oriented source across worker processes."""
+import os
+import time
+from multiprocessing import Pool
+
+import cache
+import solver
+from grid import format_board, parse_board
+from limits import BUDGET_EXHAUSTED, TIMED_OUT, Limits
+from metrics import SearchStats, write_jsonl
+
+# Written in place of a solution when a line cannot be solved
+INVALID = "INVALID"
+NO_SOLUTION = "NO_SOLUTION"
+# ... or when its search hits the timeout or node budget
+STOPPED = {TIMED_OUT: "TIMED_OUT", BUDGET_EXHAUSTED: "BUDGET_EXHAUSTED"}
+STATUSES = (INVALID, NO_SOLUTION) + tuple(STOPPED.values())
+
+# Puzzle lines handed to batch.presolve at a time with presolve=True
+PRESOLVE_BLOCK = 4096
+
+
+def solve_line(line, heuristic=None, timeout=None, max_nodes=None):
+    """Solve one puzzle line; return (solution line or status, seconds, SearchStats or None).
+
+    heuristic None picks solver.default_heuristic for the puzzle's size.
+
+    timeout (seconds) and max_nodes bound the search; a search stopped by
+    them gives TIMED_OUT or BUDGET_EXHAUSTED with the stats so far.
+    """
+    start_time = time.perf_counter()
+    try:
+        board = parse_board(line)
+    except ValueError:
+        return INVALID, time.perf_counter() - start_time, None
+    heuristic = heuristic or solver.default_heuristic(board)
+    limits = Limits(timeout, max_nodes) if timeout is not None or max_nodes is not None else None
+    result = cache.solve(board, heuristic, limits)
+    text = format_board(result.board) if result.solved else STOPPED.get(result.status, NO_SOLUTION)
+    return text, time.perf_counter() - start_time, result.stats
+
+
+def _solve_task(task):
+    return solve_line(*task)
+
+
+def puzzle_lines(lines):
+    """Skip blank lines and '#' comments."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def presolve_lines(lines):
+    """Run batch.presolve over a block of puzzle lines; return (results, open lines, seconds per line).
+
+    results has (solution line or status, seconds, stats) for every line
+    settled here and None for every line that still needs a search. The open
+    lines are those lines with their singles filled in, in input order.
+    """
+    import batch  # NumPy is only loaded when presolving
+
+    start_time = time.perf_counter()
+    texts = [None] * len(lines)
+    pending = {}
+    by_length = {}
+    for k, line in enumerate(lines):
+        by_length.setdefault(len(line), []).append(k)
+    for group in by_length.values():
+        try:
+            boards = batch.lines_to_boards([lines[k] for k in group])
+        except ValueError:
+            # Not a board size; solve_line reports these lines as INVALID
+            pending.update((k, lines[k]) for k in group)
+            continue
+        filled, status = batch.presolve(boards)
+        unreadable = (boards == 255).any(axis=1)
+        for k, row, state, bad in zip(group, filled, status.tolist(), unreadable.tolist()):
+            if state == batch.OPEN:
+                pending[k] = batch.board_line(row)
+            elif state == batch.SOLVED:
+                texts[k] = batch.board_line(row)
+            else:
+                texts[k] = INVALID if bad else NO_SOLUTION
+    share = (time.perf_counter() - start_time) / len(lines)
+    results = []
+    for text in texts:
+        if text is None:
+            results.append(None)
+        else:
+            stats = SearchStats()
+            stats.elapsed = share
+            results.append((text, share, stats))
+    return results, [pending[k] for k in sorted(pending)], share
+
+
+def _presolved(lines, search, solve_tasks):
+    """Results of solve_tasks for the lines batch.presolve leaves open, merged back in input order."""
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) == PRESOLVE_BLOCK:
+            yield from _presolve_block(block, search, solve_tasks)
+            block = []
+    if block:
+        yield from _presolve_block(block, search, solve_tasks)
+
+
+def _presolve_block(block, search, solve_tasks):
+    results, pending, share = presolve_lines(block)
+    searched = solve_tasks((line,) + search for line in pending)
+    for result in results:
+        if result is None:
+            text, elapsed, stats = next(searched)
+            result = text, elapsed + share, stats
+        yield result
+
+
+def solve_lines(lines, heuristic=None, workers=None, chunksize=32, cache_path=None, presolve=False,
+                timeout=None, max_nodes=None):
+    """Yield (solution line or status, seconds, stats) for every puzzle line, in input order.
+
+    With a cache_path, solutions are looked up in and added to that
+    cache.DiskTier file, so repeated and symmetric puzzles are not re-solved.
+    With presolve, blocks of lines first go through batch.presolve (needs
+    NumPy) and only the puzzles it cannot finish are searched. timeout and
+    max_nodes bound each puzzle's search and heuristic None picks a strategy
+    per puzzle size, as in solve_line.
+    """
+    if heuristic is not None and heuristic not in solver.HEURISTICS:
+        raise ValueError(f"Unknown heuristic: {heuristic}")
+    lines = puzzle_lines(lines)
+    # The solve_line arguments after the line
+    search = (heuristic, timeout, max_nodes)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        cache.init_process_cache(cache_path)
+        yield from _solve_all(lines, search, presolve, lambda tasks: map(_solve_task, tasks))
+        return
+    with Pool(workers, cache.init_process_cache, (cache_path,)) as pool:
+        yield from _solve_all(lines, search, presolve, lambda tasks: pool.imap(_solve_task, tasks, chunksize))
+
+
+def _solve_all(lines, search, presolve, solve_tasks):
+    if presolve:
+        return _presolved(lines, search, solve_tasks)
+    return solve_tasks((line,) + search for line in lines)
+
+
+def solve_file(source, output, heuristic=None, workers=None, stats_output=None, cache_path=None,
+               presolve=False, timeout=None, max_nodes=None):
+    """Solve every puzzle read from the source file object into output.
+
+    Each output line is the solution (or INVALID / NO_SOLUTION, or TIMED_OUT /
+    BUDGET_EXHAUSTED when a limit is given) and the solve time in
+    milliseconds, tab separated. If stats_output is given, the search stats
+    of every parsed line are written there as JSON lines.
+    Returns (puzzles, solved).
+    """
+    puzzles = solved = 0
+    for text, elapsed, stats in solve_lines(source, heuristic, workers, cache_path=cache_path,
+                                            presolve=presolve, timeout=timeout, max_nodes=max_nodes):
+        output.write(f"{text}\t{elapsed * 1000:.3f}\n")
+        if stats_output is not None and stats is not None:
+            write_jsonl(stats, stats_output, line=puzzles, strategy=heuristic or "default", solved=text not in STATUSES,
+                        status=text if text in STATUSES else "SOLVED")
+        puzzles += 1
+        solved += text not in STATUSES
+    return puzzles, solved
@@ -0,0 +1,337 @@
+"""Solution cache keyed by a symmetry-canonical form of the clues.
+
+Two puzzles that differ only by relabelling digits, swapping rows within a
+band, columns within a stack, whole bands or stacks, or transposing, share
+one canonical key, so a solution cached for one answers the other after being
+mapped back through the transform.
+
+The canonical key is the smallest relabelled grid over every transform that
+orders bands, rows, stacks and columns by invariants (clue counts, refined by
+the counts of the lines they cross). Only transforms tied on those invariants
+are enumerated, up to a budget; a highly symmetric clue pattern that exceeds
+it may get a key that its variants do not share, which costs a cache miss but
+never a wrong answer, since the key is always an image of the puzzle itself.
+"""
+import mmap
+import os
+import time
+from collections import OrderedDict
+from itertools import permutations, product
+
+try:
+    import fcntl
+except ImportError:
+    # No file locking on Windows; DiskTier.get still rejects a record under the wrong key
+    fcntl = None
+
+import solver
+from grid import format_board, parse_board
+from metrics import SearchStats
+
+# Most tied transforms tried per orientation when canonicalizing
+CANONICAL_BUDGET = 2000
+
+# Solution cache of this process, set up by init_process_cache
+_process_cache = None
+
+
+def _line_colors(grid):
+    """Invariant colour of every row and column, refined twice by the colours they cross."""
+    filled = [value != 0 for value in grid]
+    row_color = [sum(filled[r * 9:r * 9 + 9]) for r in range(9)]
+    col_color = [sum(filled[c::9]) for c in range(9)]
+    for _ in range(2):
+        row_color, col_color = (
+            [(row_color[r], tuple(sorted(col_color[c] for c in range(9) if filled[r * 9 + c]))) for r in range(9)],
+            [(col_color[c], tuple(sorted(row_color[r] for r in range(9) if filled[r * 9 + c]))) for c in range(9)])
+    return row_color, col_color
+
+
+def _tied_orders(items, key):
+    """Every ordering of items sorted by key, with tied items in each possible order."""
+    ordered = sorted(items, key=key)
+    groups = []
+    for item in ordered:
+        if groups and key(groups[-1][0]) == key(item):
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    for choice in product(*(permutations(group) for group in groups)):
+        yield [item for group in choice for item in group]
+
+
+def _line_orders(color):
+    """Every order of the nine lines consistent with the invariant colours, bands first."""
+    bands = range(3)
+    band_color = [tuple(sorted(color[b * 3:b * 3 + 3])) for b in bands]
+    for band_order in _tied_orders(bands, band_color.__getitem__):
+        inner = [_tied_orders(range(b * 3, b * 3 + 3), color.__getitem__) for b in band_order]
+        for lines in product(*(list(orders) for orders in inner)):
+            yield [line for band in lines for line in band]
+
+
+def _relabel(grid, rows, cols, best):
+    """Grid read in (rows, cols) order with digits renumbered by first appearance.
+
+    Returns None as soon as the result is known to be larger than best.
+    """
+    mapping = [0] * 10
+    next_label = 1
+    out = []
+    smaller = best is None
+    for r in rows:
+        base = r * 9
+        for c in cols:
+            value = grid[base + c]
+            if value:
+                label = mapping[value]
+                if not label:
+                    label = mapping[value] = next_label
+                    next_label += 1
+            else:
+                label = 0
+            if not smaller:
+                target = best[len(out)]
+                if label > target:
+                    return None
+                if label < target:
+                    smaller = True
+            out.append(label)
+    return out
+
+
+def canonical_form(board):
+    """(key, transform) of a 9x9 board; transform is (transposed, rows, cols, mapping)."""
+    grid = [value for row in board for value in row]
+    best = None
+    transform = None
+    for transposed in (False, True):
+        if transposed:
+            grid = [grid[c * 9 + r] for r in range(9) for c in range(9)]
+        row_color, col_color = _line_colors(grid)
+        col_orders = list(_line_orders(col_color))
+        tried = 0
+        for rows in _line_orders(row_color):
+            for cols in col_orders:
+                candidate = _relabel(grid, rows, cols, best)
+                if candidate is not None and candidate != best:
+                    best = candidate
+                    transform = (transposed, rows, cols)
+                tried += 1
+                if tried >= CANONICAL_BUDGET:
+                    break
+            if tried >= CANONICAL_BUDGET:
+                break
+    transposed, rows, cols = transform
+    mapping = _digit_mapping(board, transposed, rows, cols)
+    return "".join(map(str, best)), (transposed, rows, cols, mapping)
+
+
+def _digit_mapping(board, transposed, rows, cols):
+    """Digit relabelling of the transform, completed to all nine digits in ascending order."""
+    mapping = [0] * 10
+    next_label = 1
+    for r in rows:
+        for c in cols:
+            value = board[c][r] if transposed else board[r][c]
+            if value and not mapping[value]:
+                mapping[value] = next_label
+                next_label += 1
+    for value in range(1, 10):
+        if not mapping[value]:
+            mapping[value] = next_label
+            next_label += 1
+    return mapping
+
+
+def apply_transform(board, transform):
+    """board moved into canonical position, as an 81-character line."""
+    transposed, rows, cols, mapping = transform
+    return "".join(str(mapping[board[c][r] if transposed else board[r][c]]) for r in rows for c in cols)
+
+
+def invert_transform(line, transform):
+    """Board whose canonical image under transform is line (the inverse of apply_transform)."""
+    transposed, rows, cols, mapping = transform
+    digits = [0] * 10
+    for value in range(1, 10):
+        digits[mapping[value]] = value
+    board = [[0] * 9 for _ in range(9)]
+    for i, r in enumerate(rows):
+        for j, c in enumerate(cols):
+            value = digits[int(line[i * 9 + j])]
+            if transposed:
+                board[c][r] = value
+            else:
+                board[r][c] = value
+    return board
+
+
+class DiskTier:
+    """Append-only file of fixed-size (key, solution) records, read through mmap.
+
+    Each record is the 81-character canonical key, the 81-character canonical
+    solution and a newline. The key index is built by one scan on open.
+    Several processes may share the file (the bulk and service workers each
+    open their own DiskTier); appends hold an exclusive lock so the offset
+    recorded is the one written.
+    """
+
+    RECORD = 163
+
+    def __init__(self, path):
+        self.file = open(path, "a+b")
+        self.lock()
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size % self.RECORD:
+                # Drop a record cut short by an interrupted write
+                self.file.truncate(size - size % self.RECORD)
+        finally:
+            self.unlock()
+        self.map = None
+        self.index = {}
+        self.remap()
+        if self.map is not None:
+            for offset in range(0, len(self.map), self.RECORD):
+                self.index[self.map[offset:offset + 81].decode()] = offset
+
+    def remap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if os.fstat(self.file.fileno()).st_size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def lock(self):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+    def get(self, key):
+        offset = self.index.get(key)
+        if offset is None:
+            return None
+        if self.map is None or offset + self.RECORD > len(self.map):
+            self.remap()
+        # A record that is not this key's is a miss, never another puzzle's solution
+        if self.map is None or self.map[offset:offset + 81] != key.encode():
+            del self.index[key]
+            return None
+        return self.map[offset + 81:offset + 162].decode()
+
+    def put(self, key, solution):
+        if key in self.index:
+            return
+        self.lock()
+        try:
+            self.file.seek(0, os.SEEK_END)
+            offset = self.file.tell()
+            self.file.write(f"{key}{solution}\n".encode())
+            self.file.flush()
+        finally:
+            self.unlock()
+        self.index[key] = offset
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+class SolutionCache:
+    """Bounded LRU of solutions in memory, optionally backed by a DiskTier file.
+
+    The LRU holds both exact puzzle lines, so a resubmitted puzzle is answered
+    by one dict lookup, and canonical keys, for its symmetric variants.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.disk = DiskTier(path) if path else None
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        solution = self.entries.get(key)
+        if solution is not None:
+            self.entries.move_to_end(key)
+        elif self.disk is not None:
+            solution = self.disk.get(key)
+            if solution is not None:
+                self.remember(key, solution)
+        return solution
+
+    def remember(self, key, solution):
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get(self, board):
+        """Cached solution of board as a new 9x9 board, or None (always None for other sizes)."""
+        if len(board) != 9:
+            return None
+        line = format_board(board)
+        solution = self.lookup(line)
+        if solution is not None:
+            self.hits += 1
+            return parse_board(solution)
+        key, transform = canonical_form(board)
+        canonical = self.lookup(key)
+        if canonical is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        solved = invert_transform(canonical, transform)
+        self.remember(line, format_board(solved))
+        return solved
+
+    def put(self, board, solution):
+        if len(board) != 9:
+            return
+        key, transform = canonical_form(board)
+        canonical = apply_transform(solution, transform)
+        self.remember(format_board(board), format_board(solution))
+        self.remember(key, canonical)
+        if self.disk is not None:
+            self.disk.put(key, canonical)
+
+    def solve(self, board, heuristic="DLX", limits=None):
+        """SolveResult for board, from the cache when possible, caching any new solution."""
+        start_time = time.perf_counter()
+        solution = self.get(board)
+        if solution is not None:
+            stats = SearchStats()
+            stats.elapsed = time.perf_counter() - start_time
+            return solver.SolveResult(True, solution, stats, heuristic)
+        result = solver.solve(board, heuristic, limits=limits)
+        if result.solved:
+            self.put(board, result.board)
+        return result
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+def init_process_cache(path=None):
+    """Give this process an in-memory SolutionCache, backed by the DiskTier file at path if one is given.
+
+    Meant as a worker pool initializer (bulk, service): each worker keeps its
+    own LRU and opens its own DiskTier on the shared file.
+    """
+    global _process_cache
+    _process_cache = SolutionCache(path=path)
+
+
+def solve(board, heuristic="DLX", limits=None):
+    """solver.solve, going through this process's cache once init_process_cache has set it up."""
+    if _process_cache is not None:
+        return _process_cache.solve(board, heuristic, limits)
+    return solver.solve(board, heuristic, limits=limits)
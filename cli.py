@@ -0,0 +1,146 @@
+"""Command-line entry points for running the solver without the GUI.
+
+    python cli.py generate --count 1000 --removals 50 --seed 7 -o puzzles.txt
+    python cli.py generate --count 1000 --grade hard --seed 7 -o hard.txt
+    python cli.py grade puzzles.txt
+    python cli.py solve puzzles.txt -o solutions.txt --strategy ALL -j 4
+    python cli.py bench --json results.json
+    python cli.py serve --port 8765 -j 4
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+import benchmark
+import bulk
+import generator
+import grader
+import service
+import solver
+from grid import parse_board
+
+
+def generate_command(args):
+    written = generator.generate_batch(args.count, args.removals, args.seed, args.output,
+                                       solutions=args.solutions, workers=args.workers, box=args.box_size,
+                                       grade=args.grade)
+    logging.info(f"Wrote {written} puzzles to {args.output}")
+
+
+def grade_command(args):
+    source = sys.stdin if args.input == "-" else open(args.input)
+    try:
+        for line in bulk.puzzle_lines(source):
+            try:
+                result = grader.grade(parse_board(line))
+            except ValueError:
+                print(f"{line}\t{bulk.INVALID}")
+                continue
+            print(f"{line}\t{result.grade or bulk.NO_SOLUTION}\t{result.hardest or '-'}\t{result.steps}")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def solve_command(args):
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    stats_output = open(args.stats, "w") if args.stats else None
+    try:
+        puzzles, solved = bulk.solve_file(source, output, args.strategy, args.workers, stats_output,
+                                          cache_path=args.cache, presolve=args.presolve, timeout=args.timeout,
+                                          max_nodes=args.max_nodes)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+        if stats_output is not None:
+            stats_output.close()
+    logging.info(f"Solved {solved} of {puzzles} puzzles with {args.strategy or 'the default strategies'}")
+
+
+def serve_command(args):
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.workers, args.queue_size, args.timeout, args.cache))
+    except KeyboardInterrupt:
+        logging.info("Service stopped")
+
+
+def bench_command(args):
+    rows = benchmark.run_benchmark(args.strategies, args.categories, args.repeat)
+    print(benchmark.format_table(rows))
+    if args.json:
+        benchmark.write_json(rows, args.json)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless Sudoku tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="generate unique puzzles in bulk")
+    gen.add_argument("--count", type=int, required=True, help="number of distinct puzzles")
+    gen.add_argument("--removals", type=int, default=50, help="blanks per puzzle (difficulty)")
+    gen.add_argument("--grade", choices=grader.GRADES,
+                     help="blank each puzzle down to this grader grade instead of a --removals count")
+    gen.add_argument("--box-size", type=int, default=3, choices=(3, 4, 5),
+                     help="box size: 3 for 9x9, 4 for 16x16, 5 for 25x25")
+    gen.add_argument("--seed", default="0", help="seed; the same seed gives the same puzzles")
+    gen.add_argument("-o", "--output", required=True, help="puzzle file, one puzzle line each")
+    gen.add_argument("--solutions", help="optional solution file, line-aligned with the puzzles")
+    gen.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+    gen.set_defaults(func=generate_command)
+
+    solve = commands.add_parser("solve", help="solve puzzles from a file or stdin, in input order")
+    solve.add_argument("input", nargs="?", default="-",
+                       help="puzzle file, one 81/256/625-character line each ('0' or '.' = blank); default stdin")
+    solve.add_argument("-o", "--output", default="-",
+                       help="output file: solution (or INVALID/NO_SOLUTION) and milliseconds per line")
+    solve.add_argument("--strategy", choices=solver.HEURISTICS,
+                       help="default: ALL for 9x9 puzzles, DLX for 16x16 and 25x25")
+    solve.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+    solve.add_argument("--stats", help="write per-puzzle search stats to this file as JSON lines")
+    solve.add_argument("--cache", help="solution cache file, reused across runs for repeated or symmetric puzzles")
+    solve.add_argument("--presolve", action="store_true",
+                       help="fill singles in blocks of puzzles with NumPy first; only the rest are searched")
+    solve.add_argument("--timeout", type=float, help="give up on a puzzle after this many seconds (TIMED_OUT)")
+    solve.add_argument("--max-nodes", type=int,
+                       help="give up on a puzzle after this many search nodes (BUDGET_EXHAUSTED)")
+    solve.set_defaults(func=solve_command)
+
+    grade = commands.add_parser("grade", help="grade puzzles by the hardest logic rule they need")
+    grade.add_argument("input", nargs="?", default="-", help="puzzle file, one puzzle line each; default stdin")
+    grade.set_defaults(func=grade_command)
+
+    bench = commands.add_parser("bench", help="benchmark the strategies on the bundled corpus")
+    bench.add_argument("--strategies", nargs="+", choices=solver.HEURISTICS, default=list(solver.HEURISTICS))
+    bench.add_argument("--categories", nargs="+", choices=benchmark.CATEGORIES, default=list(benchmark.CATEGORIES))
+    bench.add_argument("--repeat", type=int, default=1, help="solve each puzzle this many times")
+    bench.add_argument("--json", help="also write the results to this JSON file")
+    bench.set_defaults(func=bench_command)
+
+    serve = commands.add_parser("serve", help="run the local HTTP/JSON solve service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+    serve.add_argument("--queue-size", type=int, default=64, help="requests waiting beyond this are refused with 503")
+    serve.add_argument("--timeout", type=float, default=10.0, help="longest deadline a request may ask for, seconds")
+    serve.add_argument("--cache", help="solution cache file shared by the workers across runs")
+    serve.set_defaults(func=serve_command)
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except generator.GenerationError as e:
+        logging.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
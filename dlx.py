@@ -0,0 +1,217 @@
+"""Exact-cover Sudoku backend: Knuth's Algorithm X on dancing links.
+
+Rows are the (cell, value) candidates and columns the constraints (324 on a
+9x9 board): each cell filled, and each value once per row, column and box.
+The links live in flat integer arrays rather than node objects. Only the
+columns the givens leave open and the candidates consistent with the givens
+are linked in, so a nearly full board builds a small matrix. The search
+always branches on the column with the fewest rows left.
+"""
+from domains import value_bit
+from grid import board_geometry
+from metrics import SearchStats
+
+ROOT = 0
+
+
+def unit_column(geometry, unit, value):
+    """Column of "value appears once in unit" (units numbered as in the geometry)."""
+    return 1 + len(geometry.cells) + unit * geometry.size + value - 1
+
+
+_ROW_COLUMNS = {}
+
+
+def row_columns(geometry):
+    """The four columns of every candidate row index * size + value - 1, built once per size."""
+    if geometry.box not in _ROW_COLUMNS:
+        _ROW_COLUMNS[geometry.box] = [
+            (1 + index,) + tuple(unit_column(geometry, unit, value) for unit in geometry.units_of[index])
+            for index in geometry.cells for value in range(1, geometry.size + 1)]
+    return _ROW_COLUMNS[geometry.box]
+
+
+class DancingLinks:
+    """One exact-cover search over an n² x n² board (0 = empty).
+
+    ``on_step`` gets the same ``("assign" / "unassign", (row, col), value)``
+    events as SudokuSolver's; search counters go into ``stats``. ``limits``
+    (a limits.Limits) is checked at every node.
+    """
+
+    def __init__(self, board, on_step=None, stats=None, limits=None):
+        self.on_step = on_step
+        self.stats = stats if stats is not None else SearchStats()
+        self.limits = limits
+        self.geometry = board_geometry(board)
+        self.size = self.geometry.size
+        self.givens = [value for row in board for value in row]
+        self.partial = []
+        self.solution = None
+        self.consistent = self.build()
+
+    def build(self):
+        """Link the open columns and candidate rows; False if the givens clash."""
+        geometry = self.geometry
+        size = self.size
+        all_values, mask_values, units_of = geometry.all_values, geometry.mask_values, geometry.units_of
+        used = [0] * len(geometry.units)
+        for index, value in enumerate(self.givens):
+            if value:
+                if not 1 <= value <= size:
+                    return False
+                bit = value_bit(value)
+                for unit in units_of[index]:
+                    if used[unit] & bit:
+                        return False
+                    used[unit] |= bit
+
+        columns = len(geometry.cells) + len(geometry.units) * size
+        headers = range(columns + 1)
+        self.up = up = list(headers)
+        self.down = down = list(headers)
+        self.column = column = list(headers)
+        self.row_of = row_of = [-1] * (columns + 1)
+        self.counts = counts = [0] * (columns + 1)
+        open_columns = [ROOT]
+        open_columns.extend(1 + index for index, value in enumerate(self.givens) if not value)
+        for unit in range(len(geometry.units)):
+            open_columns.extend(unit_column(geometry, unit, value) for value in mask_values[all_values & ~used[unit]])
+        self.left = left = [0] * (columns + 1)
+        self.right = right = [0] * (columns + 1)
+        for k, col in enumerate(open_columns):
+            left[col] = open_columns[k - 1]
+            right[col] = open_columns[(k + 1) % len(open_columns)]
+
+        columns_of = row_columns(geometry)
+        for index, value in enumerate(self.givens):
+            if value:
+                continue
+            row_unit, col_unit, box_unit = units_of[index]
+            for value in mask_values[all_values & ~(used[row_unit] | used[col_unit] | used[box_unit])]:
+                row = index * size + value - 1
+                first = len(left)
+                left.extend((first + 3, first, first + 1, first + 2))
+                right.extend((first + 1, first + 2, first + 3, first))
+                row_of.extend((row, row, row, row))
+                for node, col in enumerate(columns_of[row], first):
+                    # Append at the bottom of the column
+                    up.append(up[col])
+                    down.append(col)
+                    down[up[col]] = node
+                    up[col] = node
+                    column.append(col)
+                    counts[col] += 1
+        return True
+
+    def cover(self, col):
+        left, right, up, down, counts, column = self.left, self.right, self.up, self.down, self.counts, self.column
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                counts[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, col):
+        left, right, up, down, counts, column = self.left, self.right, self.up, self.down, self.counts, self.column
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                counts[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    def search(self, limit, depth=0):
+        """Count exact covers up to limit, keeping the first one found in self.solution."""
+        right, down, counts = self.right, self.down, self.counts
+        if right[ROOT] == ROOT:
+            if self.solution is None:
+                self.solution = self.partial[:]
+            return 1
+        # Column with the fewest rows left
+        best = right[ROOT]
+        best_size = counts[best]
+        col = right[best]
+        while col != ROOT and best_size > 1:
+            if counts[col] < best_size:
+                best, best_size = col, counts[col]
+            col = right[col]
+        if not best_size:
+            return 0
+
+        stats = self.stats
+        stats.nodes += 1
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+        if self.limits is not None:
+            self.limits.check(stats.nodes)
+        cover, uncover, left, column, size = self.cover, self.uncover, self.left, self.column, self.size
+        found = 0
+        cover(best)
+        node = down[best]
+        while node != best:
+            row = self.row_of[node]
+            self.partial.append(row)
+            stats.assignments += 1
+            if self.on_step:
+                self.on_step("assign", self.geometry.pos(row // size), row % size + 1)
+            j = right[node]
+            while j != node:
+                cover(column[j])
+                j = right[j]
+            found += self.search(limit - found, depth + 1)
+            if found >= limit:
+                # Leave the solution in place; the matrix is not reused afterwards
+                return found
+            j = left[node]
+            while j != node:
+                uncover(column[j])
+                j = left[j]
+            self.partial.pop()
+            stats.backtracks += 1
+            if self.on_step:
+                self.on_step("unassign", self.geometry.pos(row // size), row % size + 1)
+            node = down[node]
+        uncover(best)
+        return found
+
+    def count(self, limit=2):
+        if not self.consistent:
+            return 0
+        return self.search(limit)
+
+    def board(self):
+        """The first solution found as a board (list of rows), or None."""
+        if self.solution is None:
+            return None
+        size = self.size
+        values = self.givens[:]
+        for row in self.solution:
+            values[row // size] = row % size + 1
+        return [values[r * size:r * size + size] for r in range(size)]
+
+
+def solve(board, on_step=None, stats=None, limits=None):
+    """First solution of board as a new board, or None if there is none."""
+    links = DancingLinks(board, on_step, stats, limits)
+    links.count(1)
+    return links.board()
+
+
+def count_solutions(board, limit=2, stats=None, limits=None):
+    """Number of solutions of board, stopping as soon as limit is reached.
+
+    Raises limits.SearchAborted when limits are hit, with stats holding the partial counts.
+    """
+    return DancingLinks(board, stats=stats, limits=limits).count(limit)
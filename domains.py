@@ -0,0 +1,77 @@
+"""Cell domains stored as integer bitmasks.
+
+Bit ``v - 1`` of a mask is set when value ``v`` is still possible for the
+cell, so ``0x1FF`` is the full 9x9 domain ``{1..9}`` and ``0`` is a
+wipe-out. Larger boards use wider masks (16 or 25 bits).
+"""
+
+ALL_VALUES = 0x1FF
+
+# Lookup tables indexed by mask, cheaper than recomputing on every call
+POPCOUNT = [bin(mask).count("1") for mask in range(ALL_VALUES + 1)]
+MASK_VALUES = [tuple(v for v in range(1, 10) if mask >> (v - 1) & 1) for mask in range(ALL_VALUES + 1)]
+
+
+class WidePopcount:
+    """Stands in for POPCOUNT when masks are too wide for a table: wide[mask] counts the bits."""
+
+    __getitem__ = staticmethod(int.bit_count)
+
+
+class WideMaskValues(dict):
+    """Stands in for MASK_VALUES on wide masks, filling itself in as masks are looked up."""
+
+    def __missing__(self, mask):
+        values = tuple(v + 1 for v in range(mask.bit_length()) if mask >> v & 1)
+        self[mask] = values
+        return values
+
+
+def domain_tables(size):
+    """(all values mask, popcount table, mask values table) for values 1..size."""
+    if size == 9:
+        return ALL_VALUES, POPCOUNT, MASK_VALUES
+    return (1 << size) - 1, WidePopcount(), WideMaskValues()
+
+
+def value_bit(value):
+    """Mask with only value's bit set."""
+    return 1 << (value - 1)
+
+
+def popcount(mask):
+    """Number of values left in mask."""
+    return mask.bit_count()
+
+
+def lowest_bit(mask):
+    """Mask holding only the lowest set bit of mask (0 if mask is empty)."""
+    return mask & -mask
+
+
+def bit_value(bit):
+    """Value encoded by a single-bit mask."""
+    return bit.bit_length()
+
+
+def is_single(mask):
+    """True if mask holds exactly one value."""
+    return mask != 0 and mask & (mask - 1) == 0
+
+
+def mask_values(mask):
+    """Values in mask, ascending."""
+    if mask <= ALL_VALUES:
+        return MASK_VALUES[mask]
+    return tuple(v + 1 for v in range(mask.bit_length()) if mask >> v & 1)
+
+
+def values_to_mask(values):
+    mask = 0
+    for value in values:
+        mask |= 1 << (value - 1)
+    return mask
+
+
+def mask_to_set(mask):
+    return set(mask_values(mask))
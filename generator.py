@@ -0,0 +1,213 @@
+"""Headless puzzle generation: random solved boards, clue removal that keeps
+the solution unique, and batch generation across worker processes."""
+import os
+import random
+from math import isqrt
+from multiprocessing import Pool
+
+import grader
+import solver
+from grid import format_board
+from limits import BUDGET_EXHAUSTED, Limits, SearchAborted
+
+# Full removal passes remove_numbers may make before giving up
+MAX_REMOVAL_ATTEMPTS = 20
+# Solved boards are filled with singles propagation in random value order; a fill
+# that runs past this many search nodes per cell starts over with a new shuffle
+FILL_RULES = ("naked single", "hidden single")
+FILL_NODES_PER_CELL = 2
+MAX_FILL_RESTARTS = 50
+# remove_to_grade: earlier blanks tried as a swap for a removal that overshoots the
+# grade, and blanks filled back in when a pass ends short of it
+SWAP_TRIES = 8
+REFINE_RESTORES = 4
+
+
+class GenerationError(Exception):
+    pass
+
+
+def generate_solution(rng=random, box=3, limits=None):
+    """A random fully solved board with box x box boxes (9x9 by default).
+
+    Restarting after a small node budget keeps 16x16 and 25x25 boards clear
+    of the heavy tail a plain random-order backtracker has there.
+    """
+    size = box * box
+    budget = FILL_NODES_PER_CELL * size * size
+    nodes = 0
+    for attempt in range(MAX_FILL_RESTARTS):
+        if limits is not None:
+            fill_limits = Limits(max_nodes=budget, cancel=limits.cancel, deadline=limits.deadline)
+        else:
+            fill_limits = Limits(max_nodes=budget)
+        filler = solver.SudokuSolver([[0] * size for _ in range(size)], "Propagation", rng=rng, rules=FILL_RULES,
+                                     limits=fill_limits)
+        result = filler.solve()
+        if result.solved:
+            return result.board
+        if result.status == solver.NO_SOLUTION:
+            break
+        if result.status != BUDGET_EXHAUSTED:
+            raise SearchAborted(result.status)
+        nodes += result.stats.nodes
+        if limits is not None:
+            limits.check(nodes)
+    raise GenerationError("Failed to generate a valid board")
+
+
+def remove_numbers(board, count, rng=random, max_attempts=MAX_REMOVAL_ATTEMPTS, limits=None):
+    """Return a copy of the solved board with exactly count cells blanked and a unique solution.
+
+    Each pass tries the cells in a random order and keeps a removal only if
+    the puzzle stays uniquely solvable. Raises GenerationError when no pass out
+    of max_attempts reaches count. With limits, limits.SearchAborted is
+    raised once they are hit.
+    """
+    for attempt in range(max_attempts):
+        puzzle = [row[:] for row in board]
+        positions = [(i, j) for i in range(len(board)) for j in range(len(board))]
+        rng.shuffle(positions)
+        removed = 0
+        for row, col in positions:
+            if removed == count:
+                break
+            temp = puzzle[row][col]
+            puzzle[row][col] = 0
+            if solver.has_unique_solution(puzzle, limits=limits):
+                removed += 1
+            else:
+                puzzle[row][col] = temp
+        if removed == count:
+            return puzzle
+    raise GenerationError(f"Could not remove {count} numbers keeping a unique solution "
+                          f"in {max_attempts} attempts")
+
+
+def _fits_grade(puzzle, result, target, limits):
+    """Whether a graded puzzle is unique and no harder than the target grade index."""
+    if result.grade is None or grader.GRADES.index(result.grade) > target:
+        return False
+    # The rules only solve puzzles with one solution; others need the count
+    return result.solved or solver.has_unique_solution(puzzle, limits=limits)
+
+
+def remove_to_grade(board, grade, rng=random, min_removals=None, max_attempts=MAX_REMOVAL_ATTEMPTS,
+                    limits=None):
+    """Return a copy of the solved board blanked down to the given grader grade, with a unique solution.
+
+    Cells are blanked in a random order, keeping a removal only if the puzzle
+    stays unique and no harder than grade; it stops as soon as the puzzle
+    grades exactly grade with at least min_removals blanks (half the cells by
+    default). A removal that overshoots the grade is tried as a swap with an
+    earlier blank first. When a pass runs out of cells short of the grade, a
+    few blanks are filled back in and the same puzzle is refined in another
+    pass rather than started over. Raises GenerationError when no pass out of
+    max_attempts gets there.
+
+    EASY, MEDIUM and EXPERT 9x9 puzzles take well under a second; HARD ones
+    need a rarer mix of rules and take a few seconds, up to about 10 for a
+    board that fails all its passes. Pass limits to bound that (the service
+    does, with the request's deadline).
+    """
+    target = grader.GRADES.index(grade)
+    size = len(board)
+    if min_removals is None:
+        min_removals = size * size // 2
+    puzzle = [row[:] for row in board]
+    blanks = []
+    for attempt in range(max_attempts):
+        positions = [(i, j) for i in range(size) for j in range(size) if puzzle[i][j]]
+        rng.shuffle(positions)
+        for row, col in positions:
+            puzzle[row][col] = 0
+            result = grader.grade(puzzle, limits)
+            if _fits_grade(puzzle, result, target, limits):
+                blanks.append((row, col))
+                if result.grade == grade and len(blanks) >= min_removals:
+                    return puzzle
+                continue
+            if result.grade is not None and len(blanks) >= min_removals and \
+                    _swap_to_grade(puzzle, board, (row, col), blanks, grade, rng, limits):
+                return puzzle
+            puzzle[row][col] = board[row][col]
+        # Stuck below the grade: give back a few clues and carry on from here
+        for row, col in rng.sample(blanks, min(REFINE_RESTORES, len(blanks))):
+            puzzle[row][col] = board[row][col]
+            blanks.remove((row, col))
+    raise GenerationError(f"Could not reach a {grade} puzzle with {min_removals} or more blanks "
+                          f"in {max_attempts} attempts")
+
+
+def _swap_to_grade(puzzle, board, removed, blanks, grade, rng, limits):
+    """Fill back one earlier blank so the puzzle, just made too hard, grades exactly grade; True on success.
+
+    Only blanks sharing a unit with the removed cell are tried; those are the
+    clues most likely to give the rules back what the removal took.
+    """
+    row, col = removed
+    box = isqrt(len(board))
+    peers = [(i, j) for i, j in blanks if i == row or j == col or (i // box, j // box) == (row // box, col // box)]
+    for row, col in rng.sample(peers, min(SWAP_TRIES, len(peers))):
+        puzzle[row][col] = board[row][col]
+        result = grader.grade(puzzle, limits)
+        # A puzzle the rules solve is unique, so a matching grade needs no count
+        if result.grade == grade and (result.solved or solver.has_unique_solution(puzzle, limits=limits)):
+            return True
+        puzzle[row][col] = 0
+    return False
+
+
+def make_puzzle(removals, rng=random, box=3, limits=None, grade=None):
+    """Return (puzzle, solution) with removals blanks and a unique solution.
+
+    With a grade, the puzzle is blanked down to that grader grade instead
+    and removals is ignored.
+    """
+    solution = generate_solution(rng, box, limits)
+    if grade is not None:
+        return remove_to_grade(solution, grade, rng, limits=limits), solution
+    return remove_numbers(solution, removals, rng, limits=limits), solution
+
+
+def _make_puzzle_lines(task):
+    removals, seed, box, grade = task
+    try:
+        puzzle, solution = make_puzzle(removals, random.Random(seed), box, grade=grade)
+    except GenerationError:
+        return None
+    return format_board(puzzle), format_board(solution)
+
+
+def generate_batch(count, removals, seed, output, solutions=None, workers=None, chunksize=16, box=3, grade=None):
+    """Generate count distinct puzzles on a process pool, streaming them to output.
+
+    Each puzzle is written as one line (81 characters for the default box
+    size 3, grid.format_board for larger boards) as soon as it is ready;
+    if solutions is given, the matching solution goes on the same line number
+    there. Task i is seeded from (seed, i), so a given seed always produces the
+    same file. With a grade, puzzles are made with remove_to_grade instead of
+    a fixed removals count. Returns the number of puzzles written; raises
+    GenerationError if a whole round of tasks produces no new puzzle.
+    """
+    workers = workers or os.cpu_count() or 1
+    seen = set()
+    next_task = 0
+    with open(output, "w") as puzzle_file, \
+            (open(solutions, "w") if solutions else open(os.devnull, "w")) as solution_file, \
+            Pool(workers) as pool:
+        # Top up with extra tasks until count distinct puzzles have been written
+        while len(seen) < count:
+            batch = count - len(seen)
+            tasks = ((removals, f"{seed}:{i}", box, grade) for i in range(next_task, next_task + batch))
+            next_task += batch
+            for lines in pool.imap(_make_puzzle_lines, tasks, chunksize):
+                if lines is None or lines[0] in seen:
+                    continue
+                seen.add(lines[0])
+                puzzle_file.write(lines[0] + "\n")
+                solution_file.write(lines[1] + "\n")
+            if len(seen) + batch == count:
+                wanted = f"of grade {grade}" if grade else f"with {removals} removals"
+                raise GenerationError(f"No new puzzles {wanted} after {next_task} attempts")
+    return len(seen)
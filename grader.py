@@ -0,0 +1,72 @@
+"""Grade a puzzle by the logic it takes to solve, not by its clue count.
+
+The grader runs the propagation.RULES alone, with no guessing. After every
+change the Propagator goes back to its cheapest rule, as a player would, so
+a harder rule is only used once the easier ones are stuck. The grade comes
+from the hardest rule that was needed; a puzzle the rules cannot finish
+needs guessing and grades EXPERT.
+"""
+import solver
+from propagation import RULES
+
+EASY = "easy"
+MEDIUM = "medium"
+HARD = "hard"
+EXPERT = "expert"
+# Easiest first
+GRADES = (EASY, MEDIUM, HARD, EXPERT)
+
+# The grade a puzzle gets when this is the hardest rule it needs
+RULE_GRADES = {
+    "naked single": EASY,
+    "hidden single": EASY,
+    "naked pair": MEDIUM,
+    "pointing": MEDIUM,
+    "hidden pair": HARD,
+    "naked triple": HARD,
+    "hidden triple": HARD,
+}
+
+
+class Grade:
+    """Outcome of grade(): grade, the hardest rule used, and how many deductions it took.
+
+    steps counts the deductions: each value a single placed and each
+    candidate the other rules eliminated. fired counts, per rule name, the
+    rule runs that made any. solved is False when the rules got stuck (grade
+    EXPERT) or found the puzzle has no solution (grade None).
+    """
+
+    def __init__(self, grade, hardest, steps, solved, fired):
+        self.grade = grade
+        self.hardest = hardest
+        self.steps = steps
+        self.solved = solved
+        self.fired = fired
+
+    def __repr__(self):
+        return f"Grade({self.grade!r}, hardest={self.hardest!r}, steps={self.steps})"
+
+
+def grade(board, limits=None):
+    """Grade a puzzle (any of the three sizes) by solving it with the logic rules only.
+
+    A puzzle the rules solve has exactly one solution. limits is checked
+    before every rule, as in the Propagator.
+    """
+    grader = solver.SudokuSolver(board, "Propagation", limits=limits)
+    fired = dict.fromkeys(RULES, 0)
+    if not grader.is_consistent():
+        return Grade(None, None, 0, False, fired)
+    grader.initialize_domains()
+    propagator = grader.propagator
+    consistent = propagator.propagate(grader.state)
+    fired = propagator.fired
+    used = [name for name in RULES if fired[name]]
+    hardest = used[-1] if used else None
+    steps = sum(propagator.deductions.values())
+    if not consistent:
+        return Grade(None, hardest, steps, False, fired)
+    if not all(grader.state.values):
+        return Grade(EXPERT, hardest, steps, False, fired)
+    return Grade(RULE_GRADES[hardest] if hardest else EASY, hardest, steps, True, fired)
@@ -0,0 +1,113 @@
+"""Board geometry for any box size n (an n² x n² grid), computed once per size.
+
+Cells are addressed by flat index ``row * size + col``. The module-level
+tables describe the classic 9x9 board; ``geometry(n)`` gives the same tables
+for 16x16 (n = 4) and 25x25 (n = 5) boards.
+"""
+from math import isqrt
+
+from domains import domain_tables
+
+# Values above 9 are written as letters: A = 10 ... P = 25
+SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+
+
+class Geometry:
+    """Rows, columns, boxes, units and peers of an n² x n² board with n x n boxes.
+
+    Units are numbered rows first, then columns, then boxes, so a cell belongs
+    to units[row_of], units[size + col_of] and units[2 * size + box_of].
+    """
+
+    def __init__(self, box):
+        self.box = box
+        self.size = size = box * box
+        self.cells = range(size * size)
+        self.row_of = [index // size for index in self.cells]
+        self.col_of = [index % size for index in self.cells]
+        self.box_of = [(index // (size * box)) * box + (index % size) // box for index in self.cells]
+        self.rows = [tuple(r * size + c for c in range(size)) for r in range(size)]
+        self.cols = [tuple(r * size + c for r in range(size)) for c in range(size)]
+        self.boxes = [[] for _ in range(size)]
+        for index in self.cells:
+            self.boxes[self.box_of[index]].append(index)
+        self.boxes = [tuple(cells) for cells in self.boxes]
+        self.units = self.rows + self.cols + self.boxes
+        self.units_of = [(self.row_of[index], size + self.col_of[index], 2 * size + self.box_of[index])
+                         for index in self.cells]
+        # The 3 * (size - 1) - 2 * (box - 1) distinct cells sharing a row, column or box with each cell
+        self.peers = [tuple(sorted(set(self.rows[self.row_of[index]] + self.cols[self.col_of[index]]
+                                       + self.boxes[self.box_of[index]]) - {index}))
+                      for index in self.cells]
+        self.all_values, self.popcount, self.mask_values = domain_tables(size)
+
+    def index(self, row, col):
+        return row * self.size + col
+
+    def pos(self, index):
+        return self.row_of[index], self.col_of[index]
+
+
+_GEOMETRIES = {}
+
+
+def geometry(box=3):
+    """Shared Geometry for box size box (3 for 9x9)."""
+    if box not in _GEOMETRIES:
+        if not 2 <= box <= 5:
+            raise ValueError(f"Unsupported box size: {box}")
+        _GEOMETRIES[box] = Geometry(box)
+    return _GEOMETRIES[box]
+
+
+def board_geometry(board):
+    """Geometry of a board given as a list of rows."""
+    box = isqrt(len(board))
+    if box * box != len(board):
+        raise ValueError(f"A board must have n² rows, got {len(board)}")
+    return geometry(box)
+
+
+NINE = geometry(3)
+CELLS = NINE.cells
+ROW_OF = NINE.row_of
+COL_OF = NINE.col_of
+BOX_OF = NINE.box_of
+ROWS = NINE.rows
+COLS = NINE.cols
+BOXES = NINE.boxes
+# All 27 units; a cell belongs to UNITS[ROW_OF], UNITS[9 + COL_OF] and UNITS[18 + BOX_OF]
+UNITS = NINE.units
+UNITS_OF = NINE.units_of
+# The 20 distinct cells sharing a row, column or box with each cell
+PEERS = NINE.peers
+
+
+def parse_board(line):
+    """Board from a line of n⁴ characters (81, 256 or 625), with '0' or '.' for blanks.
+
+    Values 1-9 are digits, larger values the letters A-P (either case).
+    """
+    line = line.strip()
+    size = isqrt(len(line))
+    box = isqrt(size)
+    if size * size != len(line) or box * box != size or not 3 <= box <= 5:
+        raise ValueError(f"Expected 81, 256 or 625 characters, got {len(line)}")
+    board = []
+    for r in range(size):
+        row = []
+        for ch in line[r * size:r * size + size]:
+            if ch in ".0":
+                row.append(0)
+            else:
+                value = SYMBOLS.find(ch.upper()) + 1
+                if not 1 <= value <= size:
+                    raise ValueError(f"Invalid character {ch!r} in board")
+                row.append(value)
+        board.append(row)
+    return board
+
+
+def format_board(board):
+    """One-line form of board, '0' for blanks and letters for values above 9."""
+    return "".join(SYMBOLS[value - 1] if value else "0" for row in board for value in row)
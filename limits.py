@@ -0,0 +1,79 @@
+"""Deadlines, node budgets and cancellation for the searches.
+
+A Limits is handed to a search entry point (solver.solve, count_solutions,
+has_unique_solution, Arc_Consistency.ac3 / gac, dlx) and checked as the search
+runs. When a limit is hit the search unwinds with SearchAborted, whose status
+says why; solver.solve turns that into a SolveResult carrying the status and
+the stats gathered so far.
+
+The other entry points let SearchAborted through to their caller:
+solver.count_solutions and has_unique_solution, dlx.count_solutions,
+Arc_Consistency.ac3 and gac, and the generator functions built on them. Their
+result is a count, a yes/no or a set of domains, and a count or domains cut
+short would read as a real answer (a half-done count of 1 looks unique).
+Partial stats still reach the caller, through the SearchStats passed in as
+stats, which is filled in before the exception is raised. Callers that set
+limits catch SearchAborted: the service answers 504 and the GUI's background
+generation reports the status. generator.generate_solution raises it too when
+its fill stops, so generation has a single way to give up.
+"""
+import math
+import time
+
+TIMED_OUT = "timed out"
+BUDGET_EXHAUSTED = "budget exhausted"
+CANCELLED = "cancelled"
+
+
+class SearchAborted(Exception):
+    """A search stopped by its Limits; status is TIMED_OUT, BUDGET_EXHAUSTED or CANCELLED."""
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class CancelToken:
+    """Cancelled from any thread (the GUI's Reset, say) to stop the searches checking it."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Limits:
+    """A wall-clock deadline, a node budget and a cancel token, each optional.
+
+    timeout is in seconds from now; deadline is an absolute time.perf_counter()
+    value (the earlier of the two wins when both are given). max_nodes caps
+    the search nodes counted in SearchStats.nodes.
+    """
+
+    def __init__(self, timeout=None, max_nodes=None, cancel=None, deadline=None):
+        # NaN compares false with everything, so a NaN deadline would never be reached
+        if timeout is not None and math.isnan(timeout) or deadline is not None and math.isnan(deadline):
+            raise ValueError("Limits timeout and deadline must not be NaN")
+        if timeout is not None:
+            end = time.perf_counter() + timeout
+            deadline = end if deadline is None else min(deadline, end)
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+
+    def reason(self, nodes=0):
+        """Status to stop with after nodes search nodes, or None to carry on."""
+        if self.max_nodes is not None and nodes > self.max_nodes:
+            return BUDGET_EXHAUSTED
+        if self.cancel is not None and self.cancel.cancelled:
+            return CANCELLED
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return TIMED_OUT
+        return None
+
+    def check(self, nodes=0):
+        """Raise SearchAborted if a limit has been hit."""
+        status = self.reason(nodes)
+        if status is not None:
+            raise SearchAborted(status)
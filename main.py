@@ -1,17 +1,58 @@
 import tkinter as tk
 from tkinter import messagebox
-import time
 import copy
-import random
-from collections import defaultdict
+import math
+import queue
+import threading
+import generator
+import grader
+import solver
 import Arc_Consistency
 import logging
+from cache import SolutionCache
+from grid import SYMBOLS
+from limits import CANCELLED, CancelToken, Limits, SearchAborted
+from metrics import SearchStats
+from tracing import TraceSink
 
-# easy mode ranges from (10-35) , medium mode ranges from (35-50) , hard mode (50 - 55)
+# Blanks Remove Numbers makes when the difficulty is "By count"
 no_of_removals = 50
+# Remove Numbers difficulty: "By count", or a grader grade ("easy", "medium", "hard", "expert")
+# to blank cells until the puzzle needs that level of logic (also selectable in the window)
+difficulty = "By count"
+# Box size of a new window: 3 for 9x9, 4 for 16x16, 5 for 25x25 (also selectable in the window)
+box_size = 3
+# no_of_removals is for 9x9; larger boards keep more clues so the uniqueness checks stay quick
+big_board_removals = {4: 120, 5: 300}
+# Strategies that finish 16x16 and 25x25 boards quickly; the others are disabled in the
+# menu on those sizes, and a selection of one of them moves to Propagation, which still
+# animates cell by cell
+big_board_heuristics = ("GAC", "Propagation", "DLX")
+# Cell width and font size per box size
+cell_style = {3: (3, 18), 4: (2, 12), 5: (2, 9)}
 filename = "log.txt"
-
-logging.basicConfig(filename=filename, level=logging.DEBUG, 
+# Solver/AC-3 trace written to filename: "off", "summary" or "full"
+trace_level = "off"
+# Print and plot the AC-3 arc tree after an AC-3 solve (needs networkx and matplotlib)
+show_arc_tree = False
+# Solve animation: default speed in steps per second, the redraw interval, and the
+# longest a playback may lag behind before steps are skipped to catch up
+default_speed = 200
+frame_ms = 16
+max_playback_seconds = 10
+# Steps a solve may queue ahead of the playback; past that they are merged into snapshots
+max_queued_steps = 20000
+# Solutions kept in memory, and an optional file that keeps them between sessions
+cache_size = 4096
+cache_file = None
+# A solve gives up after this many seconds (None = no limit); Reset, Generate and
+# changing mode or size stop a running solve straight away
+solve_timeout = 60
+# Generate New Board and Remove Numbers run in the background too and give up after
+# this many seconds; Reset, Generate and changing mode or size stop them as well
+generate_timeout = 30
+
+logging.basicConfig(filename=filename, level=logging.INFO, 
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
@@ -20,21 +61,30 @@ class SudokuGUI:
         self.root = root
         self.root.title("Random Sudoku Solver with Heuristics")
         self.cells = {}
+        self.shown = {}  # (state, fg) each Entry currently has
+        self.pending = {}  # (text, state, fg) waiting for the next redraw
+        self.redraw_scheduled = False
         self.original_board = None
         self.solving = False
+        self.steps = None  # Step queue of the solve being played back
+        self.cancel = None  # CancelToken of the solve, generation or removal running in the background
+        self.job = None  # Result queue of the generation or removal running in the background
+        self.solution_cache = SolutionCache(cache_size, cache_file)
         self.heuristic = "MRV"  # Default heuristic
         self.removed_once = False
         self.backtracking_steps = 0
+        self.box = box_size
+        self.size = box_size * box_size
         with open(filename, "w") as f:
             pass
         f.close()
 
         # Initialize empty board
-        self.board = [[0 for _ in range(9)] for _ in range(9)]
-        self.domains = None  # For Forward Checking
+        self.board = [[0 for _ in range(self.size)] for _ in range(self.size)]
 
         try:
             self.create_gui()
+            self.update_heuristic_menu()
             self.generate_board()  # Generate a random valid board
             self.original_board = copy.deepcopy(self.board)
         except Exception as e:
@@ -44,30 +94,10 @@ class SudokuGUI:
 
     def create_gui(self):
         # Create main frame for grid
-        self.frame = tk.Frame(self.root)
-        self.frame.pack(pady=10)
-        # Create 9x9 grid inside 3x3 sub grids
-        for box_row in range(3):
-            for box_col in range(3):
-                # Create a frame for each 3x3 subgrid with a border
-                subframe = tk.Frame(
-                    self.frame,
-                    highlightbackground="black",
-                    highlightthickness=2  # Border thickness
-                )
-                subframe.grid(row=box_row, column=box_col, padx=0, pady=0, sticky="nsew")
-
-                # Fill the subframe with 3x3 Entry widgets
-                for i in range(3):
-                    for j in range(3):
-                        cell = tk.Entry(
-                            subframe,
-                            width=3,
-                            font=('Arial', 18),
-                            justify='center'
-                        )
-                        cell.grid(row=i, column=j, padx=1, pady=1)
-                        self.cells[(box_row * 3 + i, box_col * 3 + j)] = cell
+        self.grid_container = tk.Frame(self.root)
+        self.grid_container.pack(pady=10)
+        self.frame = None
+        self.build_grid()
 
         # Create control frame for buttons and heuristic selection
         control_frame = tk.Frame(self.root)
@@ -76,10 +106,9 @@ class SudokuGUI:
         # Heuristic selection
         tk.Label(control_frame, text="Heuristic:", font=('Arial', 12)).pack(side=tk.LEFT, padx=5)
         self.heuristic_var = tk.StringVar(value="MRV")
-        heuristic_menu = tk.OptionMenu(control_frame, self.heuristic_var, "MRV", "Forward Checking", "LCV", "ALL",
-                                       "AC-3",
-                                       command=self.set_heuristic)
-        heuristic_menu.pack(side=tk.LEFT, padx=5)
+        self.heuristic_menu = tk.OptionMenu(control_frame, self.heuristic_var, *solver.HEURISTICS,
+                                            command=self.set_heuristic)
+        self.heuristic_menu.pack(side=tk.LEFT, padx=5)
 
         # Buttons
         tk.Button(control_frame, text="Generate New Board", command=self.generate_board).pack(side=tk.LEFT, padx=5)
@@ -91,33 +120,103 @@ class SudokuGUI:
         mode_menu.pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Reset", command=self.reset_board).pack(side=tk.LEFT, padx=5)
         tk.Button(control_frame, text="Submit", command=self.get_input_board).pack(side=tk.LEFT, padx=5)
+        self.size_var = tk.StringVar(value=f"{self.size}x{self.size}")
+        size_menu = tk.OptionMenu(control_frame, self.size_var, "9x9", "16x16", "25x25", command=self.change_size)
+        size_menu.pack(side=tk.LEFT, padx=5)
+        self.difficulty_var = tk.StringVar(value=difficulty)
+        difficulty_menu = tk.OptionMenu(control_frame, self.difficulty_var, "By count", *grader.GRADES)
+        difficulty_menu.pack(side=tk.LEFT, padx=5)
+
+        # Animation controls
+        animation_frame = tk.Frame(self.root)
+        animation_frame.pack(pady=(0, 10))
+        self.speed_var = tk.IntVar(value=default_speed)
+        tk.Scale(animation_frame, label="Steps per second", from_=1, to=2000, orient=tk.HORIZONTAL, length=300,
+                 variable=self.speed_var).pack(side=tk.LEFT, padx=5)
+        self.instant_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(animation_frame, text="Instant", variable=self.instant_var).pack(side=tk.LEFT, padx=5)
+
+    def build_grid(self):
+        """(Re)create the Entry grid for the current box size: size x size cells in box x box sub grids."""
+        if self.frame is not None:
+            self.frame.destroy()
+        self.cells = {}
+        self.shown = {}
+        self.pending = {}
+        self.frame = tk.Frame(self.grid_container)
+        self.frame.pack()
+        box = self.box
+        width, font_size = cell_style[box]
+        for box_row in range(box):
+            for box_col in range(box):
+                # Create a frame for each sub grid with a border
+                subframe = tk.Frame(
+                    self.frame,
+                    highlightbackground="black",
+                    highlightthickness=2  # Border thickness
+                )
+                subframe.grid(row=box_row, column=box_col, padx=0, pady=0, sticky="nsew")
+
+                # Fill the subframe with box x box Entry widgets
+                for i in range(box):
+                    for j in range(box):
+                        cell = tk.Entry(
+                            subframe,
+                            width=width,
+                            font=('Arial', font_size),
+                            justify='center'
+                        )
+                        cell.grid(row=i, column=j, padx=1, pady=1)
+                        self.cells[(box_row * box + i, box_col * box + j)] = cell
+                        self.shown[(box_row * box + i, box_col * box + j)] = ('normal', 'black')
+
+    def change_size(self, value):
+        """Switch to a 9x9, 16x16 or 25x25 board and generate a new one."""
+        size = int(value.split("x")[0])
+        if size == self.size:
+            return
+        self.stop_playback()
+        self.size = size
+        self.box = {9: 3, 16: 4, 25: 5}[size]
+        self.board = [[0] * size for _ in range(size)]
+        self.build_grid()
+        logging.info(f"Board size changed to: {value}")
+        self.update_heuristic_menu()
+        self.generate_board()
+
+    def update_heuristic_menu(self):
+        """Offer only big_board_heuristics on 16x16 and 25x25 boards, moving the selection if needed."""
+        # The plain backtrackers can run for millions of nodes on the bigger boards
+        menu = self.heuristic_menu["menu"]
+        for index, name in enumerate(solver.HEURISTICS):
+            state = "normal" if self.box == 3 or name in big_board_heuristics else "disabled"
+            menu.entryconfigure(index, state=state)
+        if self.box > 3 and self.heuristic not in big_board_heuristics:
+            self.heuristic_var.set("Propagation")
+            self.set_heuristic("Propagation")
+
+    def removal_count(self):
+        """Number of cells Remove Numbers blanks on the current board size."""
+        return big_board_removals.get(self.box, no_of_removals)
 
     def change_input_mode(self, value):
         self.mode = value
+        self.stop_playback()
         print(self.mode)
         logging.info(f"Mode changed to: {self.mode}")
         if self.mode == "Mode 2":
-            for r in range(9):
-                for c in range(9):
+            for r in range(self.size):
+                for c in range(self.size):
                     self.board[r][c] = 0
-            self.domains = None
             self.update_gui()
             self.original_board = copy.deepcopy(self.board)
         elif self.mode == "Interactive":
-            self.generate_board()
-            self.remove_numbers()
+            self.generate_board(then=self.remove_numbers)
         else:
             self.generate_board()
 
     def is_user_input_solvable(self):
-        # Backup current board
-        current_board = copy.deepcopy(self.board)
-        self.solving = True
-        solvable = self.solve()
-        self.solving = False
-        self.board = current_board
-        self.update_gui()
-        return solvable
+        return solver.solve(self.board, self.heuristic, limits=Limits(solve_timeout)).solved
 
     def set_heuristic(self, value):
         """Update the selected heuristic."""
@@ -127,22 +226,48 @@ class SudokuGUI:
 
     def update_gui(self):
         """Update the GUI to reflect the current board state."""
-        for i in range(9):
-            for j in range(9):
-                self.cells[(i, j)].config(state='normal')
-                self.cells[(i, j)].delete(0, tk.END)
+        for i in range(self.size):
+            for j in range(self.size):
                 if self.board[i][j] != 0:
-                    self.cells[(i, j)].insert(0, str(self.board[i][j]))
-                    self.cells[(i, j)].config(state='disabled')
+                    self.set_cell((i, j), SYMBOLS[self.board[i][j] - 1], 'disabled')
                 else:
-                    self.cells[(i, j)].config(state='normal')
+                    self.set_cell((i, j), "", 'normal')
+
+    def set_cell(self, pos, text, state=None, fg='black'):
+        """Queue a cell change; changes made before the next redraw are drawn together.
+
+        A state or fg of None keeps the cell's current one.
+        """
+        current = self.pending.get(pos, (None,) + self.shown[pos])
+        self.pending[pos] = (text, state or current[1], fg or current[2])
+        if not self.redraw_scheduled:
+            self.redraw_scheduled = True
+            self.root.after_idle(self.redraw)
+
+    def redraw(self):
+        """Touch only the Entry widgets whose text, state or colour differ from what they show."""
+        self.redraw_scheduled = False
+        pending, self.pending = self.pending, {}
+        for pos, (text, state, fg) in pending.items():
+            cell = self.cells[pos]
+            shown_state, shown_fg = self.shown[pos]
+            # Compare against the widget's own text: the user may have typed into it
+            if cell.get() != text:
+                if shown_state != 'normal':
+                    cell.config(state='normal')
+                    shown_state = 'normal'
+                cell.delete(0, tk.END)
+                if text:
+                    cell.insert(0, text)
+            if (state, fg) != (shown_state, shown_fg):
+                cell.config(state=state, fg=fg)
+            self.shown[pos] = (state, fg)
 
     def reset_board(self):
         """Reset the board to the initial state."""
         try:
+            self.stop_playback()
             self.board = copy.deepcopy(self.original_board)
-            self.solving = False
-            self.domains = None
             self.backtracking_steps = 0
             with open(filename, "w") as f:
                 pass
@@ -158,413 +283,291 @@ class SudokuGUI:
     def is_valid(self, num, pos):
         """Check if placing num at pos is valid."""
         row, col = pos
+        box = self.box
         # Check row
-        for j in range(9):
+        for j in range(self.size):
             if self.board[row][j] == num and col != j:
                 return False
         # Check column
-        for i in range(9):
+        for i in range(self.size):
             if self.board[i][col] == num and row != i:
                 return False
-        # Check 3x3 box
-        box_x = col // 3
-        box_y = row // 3
-        for i in range(box_y * 3, box_y * 3 + 3):
-            for j in range(box_x * 3, box_x * 3 + 3):
+        # Check box
+        box_x = col // box
+        box_y = row // box
+        for i in range(box_y * box, box_y * box + box):
+            for j in range(box_x * box, box_x * box + box):
                 if self.board[i][j] == num and (i, j) != pos:
                     return False
         return True
 
-    def get_possible_values(self, pos):
-        """Return list of valid values for a given position."""
-        if self.board[pos[0]][pos[1]] != 0:
-            return []
-        possible = []
-        for num in range(1, 10):
-            if self.is_valid(num, pos):
-                possible.append(num)
-        return possible
-
-    def initialize_domains(self):
-        """Initialize domains for Forward Checking."""
-        self.domains = defaultdict(list)
-        for i in range(9):
-            for j in range(9):
-                if self.board[i][j] == 0:
-                    self.domains[(i, j)] = self.get_possible_values((i, j))
-                else:
-                    self.domains[(i, j)] = [self.board[i][j]]
-
-    def find_empty_mrv(self):
-        """Find the empty cell with the minimum remaining values (MRV)."""
-        min_values = 10  # More than possible (1-9)
-        best_cell = None
-        for i in range(9):
-            for j in range(9):
-                if self.board[i][j] == 0:
-                    if self.heuristic in ("ALL", "AC-3", "Forward Checking"):
-                        possible = len(self.domains[(i, j)])
-                    else:
-                        possible = len(self.get_possible_values((i, j)))
-                    if possible < min_values:
-                        min_values = possible
-                        best_cell = (i, j)
-                    if possible == 1:
-                        return best_cell
-        return best_cell
-
-    def get_lcv_values(self, pos):
-        """Sort values for pos based on Least Constraining Value (LCV)."""
-        row, col = pos
-        value_counts = []
-        fc = False
-
-        if self.heuristic in ("ALL", "AC-3", "Forward Checking"):
-            possible = self.domains[(row, col)]
-            fc = True
-        else:
-            possible = self.get_possible_values((row, col))
-
-        for num in possible:
-            count = 0
-            # Check related cells (row, column, box)
-            for j in range(9):
-                if self.board[row][j] == 0 and (row, j) != pos:
-                    if num in (
-                            self.domains[
-                                (row, j)] if fc else self.get_possible_values(
-                                (row, j))):
-                        count += 1
-            for i in range(9):
-                if self.board[i][col] == 0 and (i, col) != pos:
-                    if num in (
-                            self.domains[
-                                (i, col)] if fc else self.get_possible_values(
-                                (i, col))):
-                        count += 1
-            box_x = col // 3
-            box_y = row // 3
-            for i in range(box_y * 3, box_y * 3 + 3):
-                for j in range(box_x * 3, box_x * 3 + 3):
-                    if self.board[i][j] == 0 and (i, j) != pos:
-                        if num in (
-                                self.domains[
-                                    (i, j)] if fc else self.get_possible_values(
-                                    (i, j))):
-                            count += 1
-            value_counts.append((count, num))
-
-        # Sort by count (ascending) to get the least constraining values first
-        value_counts.sort()
-        return [num for _, num in value_counts]
-
-    def update_domains(self, pos, value):
-        """Update domains for Forward Checking after assigning value to pos."""
-        row, col = pos
-        affected_cells = []
-
-        # Update row
-        for j in range(9):
-            if self.board[row][j] == 0 and (row, j) != pos:
-                if value in self.domains[(row, j)]:
-                    self.domains[(row, j)].remove(value)
-                    affected_cells.append((row, j))
-
-        # Update column
-        for i in range(9):
-            if self.board[i][col] == 0 and (i, col) != pos:
-                if value in self.domains[(i, col)]:
-                    self.domains[(i, col)].remove(value)
-                    affected_cells.append((i, col))
-
-        # Update 3x3 box
-        box_x = col // 3
-        box_y = row // 3
-        for i in range(box_y * 3, box_y * 3 + 3):
-            for j in range(box_x * 3, box_x * 3 + 3):
-                if self.board[i][j] == 0 and (i, j) != pos:
-                    if value in self.domains[(i, j)]:
-                        self.domains[(i, j)].remove(value)
-                        affected_cells.append((i, j))
-
-        return affected_cells
-
-    def restore_domains(self, affected_cells, value):
-        """Restore domains for Forward Checking when backtracking."""
-        for pos in affected_cells:
-            if value not in self.domains[pos]:
-                self.domains[pos].append(value)
-
-    def generate_board(self):
-        """Generate a random valid Sudoku board using backtracking with MRV."""
-        try:
-            # Clear the board
-            self.board = [[0 for _ in range(9)] for _ in range(9)]
-            self.domains = None
-
-            def fill_board():
-                empty = self.find_empty_mrv()
-                if not empty:
-                    return True
-                row, col = empty
-
-                values = list(range(1, 10))
-                random.shuffle(values)  # Randomize value order
-                for num in values:
-                    if self.is_valid(num, (row, col)):
-                        self.board[row][col] = num
-                        if fill_board():
-                            return True
-                        self.board[row][col] = 0
-                return False
+    def generate_board(self, then=None):
+        """Generate a random valid Sudoku board in the background; then() runs once it is shown."""
+        box = self.box
+        self.start_job(lambda limits: generator.generate_solution(box=box, limits=limits),
+                       lambda event, result: self.board_generated(event, result, then))
 
-            if fill_board():
-                self.original_board = copy.deepcopy(self.board)
-                self.update_gui()
-                self.removed_once = False
-
-                print("Generated a new random Sudoku board")
-                logging.info("Generated a new random Sudoku board")
-           
-            else:
-                print("Error: Failed to generate a valid Sudoku board")
-                logging.error("Error: Failed to generate a valid Sudoku board")
-               
-                messagebox.showerror("Sudoku Generator", "Failed to generate a valid board!")
-        except Exception as e:
-            print(f"Error in generate_board: {e}")
-            logging.error(f"Error in generate_board: {e}")
+    def board_generated(self, event, result, then):
+        if event == "error":
+            self.job_failed("generate_board", "generation", result)
+            return
+        self.board = result
+        self.original_board = copy.deepcopy(self.board)
+        self.update_gui()
+        self.removed_once = False
 
+        print("Generated a new random Sudoku board")
+        logging.info("Generated a new random Sudoku board")
+        if then is not None:
+            then()
 
     def remove_numbers(self):
-        """Remove exactly 43 numbers ensuring the puzzle has a unique solution."""
+        """Remove numbers in the background, ensuring the puzzle has a unique solution.
+
+        Blanks exactly removal_count() cells, or with a grade picked as the
+        difficulty, blanks cells until the puzzle grades at that level.
+        """
+        if self.job is not None:
+            logging.info("Remove Numbers ignored: a board is still being generated")
+            return
         if self.removed_once:
             messagebox.showwarning("Warning", "Numbers can only be removed once per generated board.")
             logging.warning("Attempted to remove numbers again, but numbers can only be removed once per generated board.")
             
             return
 
-        def has_unique_solution(board):
-            solutions = []
-
-            def count_solutions():
-                empty = self.find_empty_mrv()
-                if not empty:
-                    solutions.append(1)
-                    return len(solutions) <= 1
-                row_, col_ = empty
-                for num in self.get_possible_values((row_, col_)):
-                    if self.is_valid(num, (row_, col_)):
-                        board[row_][col_] = num
-                        if not count_solutions():
-                            return False
-                        board[row_][col_] = 0
-                return True
-
-            return count_solutions() and len(solutions) == 1
-
-        def try_removal(board, count):
-            positions = [(i, j) for i in range(9) for j in range(9)]
-            random.shuffle(positions)
-            removed = 0
-
-            for row, col in positions:
-                if removed == count:
-                    break
-                temp = board[row][col]
-                board[row][col] = 0
-                if has_unique_solution(copy.deepcopy(board)):
-                    removed += 1
-                else:
-                    board[row][col] = temp
-
-            return removed == count, board
+        board, grade, count = self.original_board, self.difficulty_var.get(), self.removal_count()
+        self.start_job(lambda limits: self.make_puzzle(board, grade, count, limits), self.numbers_removed)
 
-        # Keep trying until we get a board with exactly 43 removable cells
-        while True:
-            board_copy = copy.deepcopy(self.original_board)
-            success, new_board = try_removal(board_copy, count=no_of_removals)
-            if success:
-                self.board = new_board
-                break
+    def make_puzzle(self, board, grade, count, limits):
+        """Worker thread: (puzzle, grader.Grade) from the solved board, by grade or by removal count."""
+        if grade in grader.GRADES:
+            puzzle = generator.remove_to_grade(board, grade, limits=limits)
+        else:
+            puzzle = generator.remove_numbers(board, count, limits=limits)
+        return puzzle, grader.grade(puzzle, limits)
 
+    def numbers_removed(self, event, result):
+        if event == "error":
+            self.job_failed("remove_numbers", "removing numbers", result)
+            return
+        self.board, grade = result
         self.removed_once = True
         self.original_board = copy.deepcopy(self.board)
         self.update_gui()
-        print(f"Exactly {no_of_removals} numbers removed")
-        logging.info(f"Successfully removed {no_of_removals} numbers from the board")
-                
-
-    def solve_ALL(self):
-        """Solve using MRV + LCV + Forward Checking (combined heuristics)."""
+        removed = sum(value == 0 for row in self.board for value in row)
+        print(f"Exactly {removed} numbers removed")
+        logging.info(f"Successfully removed {removed} numbers from the board: grade {grade.grade} "
+                     f"(hardest rule: {grade.hardest or 'none'}, {grade.steps} steps)")
+
+    def start_job(self, work, on_done):
+        """Run work(limits) on a worker thread, stopping whatever runs now; on_done(event, result) gets its outcome.
+
+        on_done runs on the Tk thread with ("done", value) or ("error", exception),
+        unless the job was stopped first (stop_playback).
+        """
+        self.stop_playback()
+        self.cancel = CancelToken()
+        limits = Limits(generate_timeout, cancel=self.cancel)
+        self.job = results = queue.Queue()
+        threading.Thread(target=self.run_job, args=(work, limits, results), daemon=True).start()
+        self.root.after(frame_ms, self.poll_job, results, on_done)
+
+    def run_job(self, work, limits, results):
+        """Worker thread: put the outcome of work(limits) into results."""
         try:
-            if not self.solving:
-                return False
-
-            # Initialize domains once
-            if self.domains is None and self.heuristic != "AC-3":
-                self.initialize_domains()
-
-            # MRV: Find the cell with the smallest domain (most constrained)
-            cell = self.find_empty_mrv()
-            if not cell:
-                return True  # Solved
-
-            row, col = cell
-
-            # LCV: Order values to try least-constraining first
-            possible_values = self.get_lcv_values(cell)
-
-            for num in possible_values:
-                # FC: Update domains and track changes
-                affected_cells = self.update_domains(cell, num)
-
-                # FC: Check for domain wipe-out (inconsistency)
-                if not all(len(self.domains[(i, j)]) > 0
-                           for i in range(9) for j in range(9)
-                           if self.board[i][j] == 0):
-                    self.restore_domains(affected_cells, num)
-                    continue
-
-                # Assign value
-                self.board[row][col] = num
-                self.cells[(row, col)].delete(0, tk.END)
-                self.cells[(row, col)].insert(0, str(num))
-                self.cells[(row, col)].config(fg='blue')
-                self.root.update()
-                time.sleep(0.05)
-
-                # Recurse with all heuristics still active
-                if self.solve_ALL():
-                    return True
-
-                # Backtrack
-                print(f"Backtracking from cell ({row},{col}), value {num}")
-                logging.info(f"Backtracking from cell ({row},{col}), value {num}")
-                self.board[row][col] = 0
-                self.backtracking_steps += 1
-                self.cells[(row, col)].delete(0, tk.END)
-                self.cells[(row, col)].config(fg='black')
-                self.root.update()
-                time.sleep(0.05)
-
-                # FC: Undo domain pruning
-                self.restore_domains(affected_cells, num)
-
-            return False
-
+            results.put(("done", work(limits)))
         except Exception as e:
-            print(f"Error in solve_ALL: {e}")
-            return False
+            results.put(("error", e))
 
-    def solve(self):
-        """Solve the Sudoku puzzle using selected heuristic."""
+    def poll_job(self, results, on_done):
+        if results is not self.job:
+            return
         try:
-            if not self.solving:
-                return False
-
-            # Initialize domains for Forward Checking
-            if self.heuristic == "Forward Checking" and self.domains is None:
-                self.initialize_domains()
-
-            empty = self.find_empty_mrv()
-            if not empty:
-                return True
-            row, col = empty
-
-            # Get values to try (LCV or default order)
-            possible_values = self.get_lcv_values((row, col)) if self.heuristic == "LCV" else \
-                (self.domains[(row, col)] if self.heuristic == "Forward Checking" else self.get_possible_values(
-                    (row, col)))
-
-            for num in possible_values:
-                print(f"Assigning value {num} to cell ({row},{col})")
-                logging.info(f"Assigning value {num} to cell ({row},{col})")
-                if self.heuristic == "Forward Checking":
-                    # Check if assignment leads to empty domains
-                    affected_cells = self.update_domains((row, col), num)
-                    valid = True
-                    for i in range(9):
-                        for j in range(9):
-                            if self.board[i][j] == 0 and len(self.domains[(i, j)]) == 0:
-                                valid = False
-                                break
-                        if not valid:
-                            break
-                    if not valid:
-                        self.restore_domains(affected_cells, num)
-                        continue
-
-                self.board[row][col] = num
-                self.cells[(row, col)].delete(0, tk.END)
-                self.cells[(row, col)].insert(0, str(num))
-                self.cells[(row, col)].config(fg='blue')
-                self.root.update()
-                time.sleep(0.05)  # Delay for visual effect
-
-                if self.solve():
-                    return True
-
-                print(f"Backtracking from cell ({row},{col}), value {num}")
-                logging.info(f"Backtracking from cell ({row},{col}), value {num}")
-                self.board[row][col] = 0
-                self.backtracking_steps += 1
-                self.cells[(row, col)].delete(0, tk.END)
-                self.cells[(row, col)].config(fg='black')
-                self.root.update()
-                time.sleep(0.05)
-
-                if self.heuristic == "Forward Checking":
-                    self.restore_domains(affected_cells, num)
-
-            return False
-        except Exception as e:
-            print(f"Error in solve: {e}")
-            return False
+            event, result = results.get_nowait()
+        except queue.Empty:
+            self.root.after(frame_ms, self.poll_job, results, on_done)
+            return
+        self.job = None
+        self.cancel = None
+        on_done(event, result)
+
+    def job_failed(self, name, what, error):
+        """Report a background generation or removal that did not finish."""
+        if isinstance(error, SearchAborted):
+            logging.warning(f"Gave up {what}: search {error.status}")
+            if error.status != CANCELLED:
+                messagebox.showwarning("Sudoku Generator", f"Gave up {what}: search {error.status} "
+                                                           f"after {generate_timeout} seconds")
+        elif isinstance(error, generator.GenerationError):
+            print(f"Error in {name}: {error}")
+            logging.error(f"Error in {name}: {error}")
+            messagebox.showerror("Sudoku Generator", str(error))
+        else:
+            print(f"Error in {name}: {error}")
+            logging.error(f"Error in {name}: {error}")
 
     def solve_puzzle(self):
-        """Start the solving process."""
-        if self.solving:
+        """Start solving in a background thread and play its steps back in the grid."""
+        if self.solving or self.job is not None:
             return
+        self.solving = True
+        self.steps = queue.Queue(max_queued_steps)
+        animate = not self.instant_var.get()
+        board = [row[:] for row in self.board]
+        solution = self.solution_cache.get(board)
+        if solution is not None:
+            logging.info("Puzzle answered from the solution cache")
+            self.finish_solve("done", solver.SolveResult(True, solution, SearchStats(), self.heuristic), None)
+            return
+        self.cancel = CancelToken()
+        limits = Limits(solve_timeout, cancel=self.cancel)
+        worker = threading.Thread(target=self.run_solver, args=(board, self.heuristic, self.steps, animate, limits),
+                                  daemon=True)
+        worker.start()
+        self.root.after(0, self.play_steps, self.steps)
+
+    def run_solver(self, board, heuristic, steps, animate, limits=None):
+        """Worker thread: solve, streaming (event, pos, value) steps and finally ("done", ...) into steps.
+
+        The worker never waits for the playback: while the queue is full, its
+        steps are merged into one ("frame", {pos: value}, None) snapshot that is
+        queued as soon as there is room.
+        """
+        pending = {}
+
+        def on_step(event, pos, num):
+            nonlocal pending
+            # Only this thread adds to steps, so a queue that is not full has room
+            if not pending and not steps.full():
+                steps.put_nowait((event, pos, num))
+                return
+            pending[pos] = num if event == "assign" else 0
+            if not steps.full():
+                steps.put_nowait(("frame", pending, None))
+                pending = {}
+
+        cancel = limits.cancel if limits is not None else None
         try:
-            self.solving = True
-            self.domains = None  # Reset domains
-            start_time = time.time()
-            if self.heuristic == "ALL":
-                solved = self.solve_ALL()
-            elif self.heuristic == "AC-3":
-                solved = self.solve_ac3()
+            arc_tree = {} if show_arc_tree and heuristic == "AC-3" else None
+            with TraceSink(trace_level, filename) as trace:
+                result = solver.solve(board, heuristic, on_step=on_step if animate else None, trace=trace,
+                                      arc_tree=arc_tree, limits=limits)
+            if result.solved:
+                self.solution_cache.put(board, result.board)
+            if pending:
+                self.put_final(steps, ("frame", pending, None), cancel)
+            self.put_final(steps, ("done", result, arc_tree), cancel)
+        except Exception as e:
+            self.put_final(steps, ("error", e, None), cancel)
+
+    def put_final(self, steps, message, cancel):
+        """Queue a solve's last message, waiting for room unless the solve has been abandoned."""
+        while True:
+            try:
+                steps.put(message, timeout=frame_ms / 1000)
+                return
+            except queue.Full:
+                if cancel is not None and cancel.cancelled:
+                    return
+
+    def stop_playback(self):
+        """Abandon the running solve or generation: stop its search and ignore its remaining results."""
+        if self.cancel is not None:
+            self.cancel.cancel()
+            self.cancel = None
+        self.steps = None
+        self.job = None
+        self.solving = False
+
+    def play_steps(self, steps):
+        """Apply the next batch of solver steps and reschedule itself with root.after.
+
+        The batch size follows the speed slider; when the backlog would take
+        more than max_playback_seconds to show, the batch grows to catch up,
+        and only the last value of each cell in a batch is drawn.
+        """
+        if steps is not self.steps:
+            return
+        speed = max(1, self.speed_var.get())
+        interval = max(frame_ms, 1000 // speed)
+        batch = max(1, speed * interval // 1000,
+                    math.ceil(steps.qsize() * interval / (max_playback_seconds * 1000)))
+
+        frame = {}
+        for _ in range(batch):
+            try:
+                step = steps.get_nowait()
+            except queue.Empty:
+                break
+            event, pos, num = step
+            if event in ("done", "error"):
+                self.show_frame(frame)
+                self.finish_solve(event, pos, num)
+                return
+            if event == "frame":
+                frame.update(pos)
             else:
-                solved = self.solve()
-
-            if solved:
-                self.solving = False
-                elapsed = time.time() - start_time
-                print(
-                    f"Heuristic {self.heuristic} took {elapsed:.3f} seconds and number of backtracking steps = {self.backtracking_steps}")
-                logging.info(
-                    f"Heuristic {self.heuristic} took {elapsed:.3f} seconds and number of backtracking steps = {self.backtracking_steps}")
-                messagebox.showinfo("Sudoku Solver", f"Puzzle solved successfully with {self.heuristic}!")
+                frame[pos] = num if event == "assign" else 0
+        self.show_frame(frame)
+        self.root.after(interval, self.play_steps, steps)
+
+    def show_frame(self, frame):
+        """Draw the solver's current value (0 = empty) for each cell in frame."""
+        for pos, num in frame.items():
+            if num:
+                self.set_cell(pos, SYMBOLS[num - 1], fg='blue')
             else:
-                self.solving = False
-                elapsed = time.time() - start_time
-                print(
-                    f"Heuristic {self.heuristic} took {elapsed:.3f} seconds and number of backtracking steps = {self.backtracking_steps}")
-                logging.info( f"Heuristic {self.heuristic} took {elapsed:.3f} seconds and number of backtracking steps = {self.backtracking_steps}")
-                messagebox.showerror("Sudoku Solver", "No solution exists!")
-        except Exception as e:
-            print(f"Error in solve_puzzle: {e}")
-            self.solving = False
+                # An empty cell's colour does not show, so leave it until the next value
+                self.set_cell(pos, "", fg=None)
+
+    def finish_solve(self, event, result, arc_tree):
+        self.stop_playback()
+        if event == "error":
+            print(f"Error in solve_puzzle: {result}")
+            logging.error(f"Error in solve_puzzle: {result}")
+            return
+        if result.solved:
+            # Instant mode (or skipped frames) may not have drawn every cell yet
+            self.show_frame({(i, j): result.board[i][j] for i in range(self.size) for j in range(self.size)
+                             if self.board[i][j] == 0})
+            # Draw now rather than when idle: the dialog below would show over a stale grid
+            self.redraw()
+        self.board = result.board
+        if not result.solved:
+            # An aborted search unwinds without unassign steps; clear what its branch left in the grid
+            self.update_gui()
+            self.redraw()
+        self.backtracking_steps = result.stats.backtracks
+        print(
+            f"Heuristic {self.heuristic} took {result.stats.elapsed:.3f} seconds and number of backtracking steps = {self.backtracking_steps}")
+        logging.info(
+            f"Heuristic {self.heuristic} took {result.stats.elapsed:.3f} seconds and number of backtracking steps = {self.backtracking_steps}")
+        stats_line = result.stats.to_json(heuristic=self.heuristic, solved=result.solved, status=result.status)
+        logging.info(f"Search stats: {stats_line}")
+        if result.solved:
+            messagebox.showinfo("Sudoku Solver", f"Puzzle solved successfully with {self.heuristic}!")
+        elif result.status == solver.NO_SOLUTION:
+            messagebox.showerror("Sudoku Solver", "No solution exists!")
+        else:
+            messagebox.showwarning("Sudoku Solver", f"Gave up: search {result.status} after "
+                                                    f"{result.stats.elapsed:.1f} seconds")
+        if arc_tree:
+            print("\nArc Consistency Tree:")
+            Arc_Consistency.print_arc_tree(arc_tree)
+            Arc_Consistency.visualize_arc_tree(arc_tree, block=False)
 
     def get_input_board(self):
         full = True
-        for i in range(9):
-            for j in range(9):
+        for i in range(self.size):
+            for j in range(self.size):
                 try:
-                    value = self.cells[(i, j)].get().strip()
+                    value = self.cells[(i, j)].get().strip().upper()
                     if value:
-                        num = int(value)
-                        if self.is_valid(num, (i, j)) and 1 <= num <= 9:
+                        if len(value) != 1 or value not in SYMBOLS[:self.size]:
+                            raise ValueError(f"Invalid value {value!r} at ({i},{j})")
+                        num = SYMBOLS.index(value) + 1
+                        if self.is_valid(num, (i, j)):
                             self.board[i][j] = num
                         else:
                             raise ValueError(f"Invalid number {num} at ({i},{j})")
@@ -581,22 +584,6 @@ class SudokuGUI:
         self.update_gui()
         self.removed_once = False
 
-    def solve_ac3(self):
-        dom = Arc_Consistency.initialize_domains(self.board)
-        pruned_dom = Arc_Consistency.ac3(self.board, dom, Arc_Consistency.define_arcs(self.board), filename=filename)
-        if not pruned_dom:
-            messagebox.showerror("Sudoku Solver", "AC-3 failed")
-            return
-
-        # Convert domain to dictionary format for use in solver
-        # Convert 2D list to dictionary with (i, j) keys
-        self.domains = defaultdict(list)
-        for i in range(9):
-            for j in range(9):
-                self.domains[(i, j)] = list(pruned_dom[i][j])
-
-        return self.solve_ALL()
-
     def run(self):
         """Start the main loop."""
         self.root.mainloop()
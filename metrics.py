@@ -0,0 +1,48 @@
+"""Structured counters filled in by the solver, with a JSON-lines export."""
+import json
+
+
+class SearchStats:
+    """What one solve did and where its time went.
+
+    nodes             search nodes expanded (cells branched on)
+    assignments       values placed on the board
+    backtracks        assignments undone
+    revise_calls      AC-3 arc revisions attempted
+    values_pruned     values removed from domains, by AC-3 and forward checking
+    wipeouts          domains emptied by pruning
+    max_depth         deepest level of the search tree reached
+    ac3_time          seconds spent in the AC-3 pre-pass
+    search_time       seconds spent in the backtracking search
+    elapsed           total seconds for the solve
+    """
+
+    FIELDS = ("nodes", "assignments", "backtracks", "revise_calls", "values_pruned", "wipeouts",
+              "max_depth", "ac3_time", "search_time", "elapsed")
+
+    def __init__(self):
+        self.nodes = 0
+        self.assignments = 0
+        self.backtracks = 0
+        self.revise_calls = 0
+        self.values_pruned = 0
+        self.wipeouts = 0
+        self.max_depth = 0
+        self.ac3_time = 0.0
+        self.search_time = 0.0
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def to_json(self, **extra):
+        """One JSON object with the counters plus any extra fields (puzzle, strategy, ...)."""
+        return json.dumps({**extra, **self.as_dict()})
+
+    def __repr__(self):
+        return f"SearchStats({', '.join(f'{k}={v}' for k, v in self.as_dict().items())})"
+
+
+def write_jsonl(stats, f, **extra):
+    """Append stats as one JSON line to the open file f."""
+    f.write(stats.to_json(**extra) + "\n")
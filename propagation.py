@@ -0,0 +1,266 @@
+"""Logic rules run to a fixpoint on a SearchState at every search node.
+
+Each rule is a function ``rule(state)`` that narrows the state's domains
+(or places values) through the state, so the search undoes it with the rest
+of the node. A rule returns how many changes it made and raises
+Contradiction when the position cannot be completed.
+"""
+from itertools import combinations
+
+from domains import bit_value, lowest_bit, value_bit
+from search_state import ASSIGNED
+
+
+class Contradiction(Exception):
+    """Raised by a rule when some cell or unit has no way left to be filled."""
+
+
+def place(state, index, value):
+    """Assign value to the cell and remove it from the domains of its empty peers."""
+    bit = value_bit(value)
+    if state.domains[index] != bit:
+        state.set_domain(index, bit)
+    state.assign(index, value)
+    domains = state.domains
+    values = state.values
+    for k in state.geometry.peers[index]:
+        if domains[k] & bit and not values[k]:
+            if not state.remove_bit(k, bit):
+                raise Contradiction
+
+
+def restrict(state, index, mask):
+    """Narrow the cell's domain to mask; return 1 if it changed."""
+    old = state.domains[index]
+    if old & mask == old:
+        return 0
+    if not old & mask:
+        raise Contradiction
+    state.set_domain(index, old & mask)
+    return 1
+
+
+def naked_singles(state):
+    """Place every empty cell that has a single value left."""
+    if state.buckets[0]:
+        raise Contradiction
+    singles = state.buckets[1]
+    changed = 0
+    while singles:
+        index = next(iter(singles))
+        place(state, index, bit_value(state.domains[index]))
+        changed += 1
+    return changed
+
+
+def _unit_candidates(state, unit):
+    """(placed mask, empty cells) of a unit."""
+    placed = 0
+    empty = []
+    for k in unit:
+        value = state.values[k]
+        if value:
+            placed |= value_bit(value)
+        else:
+            empty.append(k)
+    return placed, empty
+
+
+def hidden_singles(state):
+    """Place a value that fits in only one cell of a unit."""
+    domains = state.domains
+    all_values = state.geometry.all_values
+    changed = 0
+    for unit in state.geometry.units:
+        placed, empty = _unit_candidates(state, unit)
+        once = twice = 0
+        for k in empty:
+            twice |= once & domains[k]
+            once |= domains[k]
+        if once | placed != all_values:
+            raise Contradiction
+        singles = once & ~twice & ~placed
+        while singles:
+            bit = lowest_bit(singles)
+            singles &= ~bit
+            # An earlier placement in this unit may have taken the only cell
+            cells = [k for k in empty if not state.values[k] and domains[k] & bit]
+            if not cells:
+                raise Contradiction
+            place(state, cells[0], bit_value(bit))
+            changed += 1
+    return changed
+
+
+def naked_subsets(state, size):
+    """size cells of a unit sharing exactly size values: drop those values from the unit's other cells."""
+    domains = state.domains
+    popcount = state.popcount
+    changed = 0
+    for unit in state.geometry.units:
+        _, empty = _unit_candidates(state, unit)
+        if len(empty) <= size:
+            continue
+        small = [k for k in empty if 2 <= popcount[domains[k]] <= size]
+        for cells in combinations(small, size):
+            union = 0
+            for k in cells:
+                union |= domains[k]
+            count = popcount[union]
+            if count < size:
+                raise Contradiction
+            if count == size:
+                for k in empty:
+                    if k not in cells:
+                        changed += restrict(state, k, ~union)
+    return changed
+
+
+def hidden_subsets(state, size):
+    """size values confined to the same size cells of a unit: drop every other value from those cells."""
+    domains = state.domains
+    geometry = state.geometry
+    changed = 0
+    for unit in geometry.units:
+        placed, empty = _unit_candidates(state, unit)
+        if len(empty) <= size:
+            continue
+        where = {}
+        for value in geometry.mask_values[geometry.all_values & ~placed]:
+            bit = value_bit(value)
+            cells = frozenset(k for k in empty if domains[k] & bit)
+            if 2 <= len(cells) <= size:
+                where[bit] = cells
+        for bits in combinations(where, size):
+            cells = frozenset().union(*(where[bit] for bit in bits))
+            if len(cells) < size:
+                raise Contradiction
+            if len(cells) == size:
+                mask = 0
+                for bit in bits:
+                    mask |= bit
+                for k in cells:
+                    changed += restrict(state, k, mask)
+    return changed
+
+
+def naked_pairs(state):
+    return naked_subsets(state, 2)
+
+
+def hidden_pairs(state):
+    return hidden_subsets(state, 2)
+
+
+def naked_triples(state):
+    return naked_subsets(state, 3)
+
+
+def hidden_triples(state):
+    return hidden_subsets(state, 3)
+
+
+def _eliminate_outside(state, bit, unit, keep):
+    """Remove bit from the empty cells of unit that are not in keep."""
+    changed = 0
+    for k in unit:
+        if k not in keep and not state.values[k] and state.domains[k] & bit:
+            if not state.remove_bit(k, bit):
+                raise Contradiction
+            changed += 1
+    return changed
+
+
+def pointing(state):
+    """Pointing pairs and box/line reduction.
+
+    A value confined to one row or column within a box is removed from the
+    rest of that line; a value confined to one box within a line is removed
+    from the rest of that box.
+    """
+    domains = state.domains
+    geometry = state.geometry
+    changed = 0
+    for box in geometry.boxes:
+        placed, empty = _unit_candidates(state, box)
+        for value in geometry.mask_values[geometry.all_values & ~placed]:
+            bit = value_bit(value)
+            cells = [k for k in empty if domains[k] & bit]
+            if len(cells) < 2:
+                continue
+            if len({geometry.row_of[k] for k in cells}) == 1:
+                changed += _eliminate_outside(state, bit, geometry.rows[geometry.row_of[cells[0]]], box)
+            elif len({geometry.col_of[k] for k in cells}) == 1:
+                changed += _eliminate_outside(state, bit, geometry.cols[geometry.col_of[cells[0]]], box)
+    for line in geometry.rows + geometry.cols:
+        placed, empty = _unit_candidates(state, line)
+        for value in geometry.mask_values[geometry.all_values & ~placed]:
+            bit = value_bit(value)
+            cells = [k for k in empty if domains[k] & bit]
+            if len(cells) >= 2 and len({geometry.box_of[k] for k in cells}) == 1:
+                changed += _eliminate_outside(state, bit, geometry.boxes[geometry.box_of[cells[0]]], line)
+    return changed
+
+
+# Every rule by name, cheapest first; the engine tries them in this order
+RULES = {
+    "naked single": naked_singles,
+    "hidden single": hidden_singles,
+    "naked pair": naked_pairs,
+    "pointing": pointing,
+    "hidden pair": hidden_pairs,
+    "naked triple": naked_triples,
+    "hidden triple": hidden_triples,
+}
+
+
+class Propagator:
+    """Runs the enabled rules on a state until none of them changes anything.
+
+    ``rules`` is an iterable of rule names from RULES (all of them by default)
+    or rule functions. After any change the engine starts over from the
+    first, cheapest rule. ``fired`` counts, by rule name, how often each rule
+    made progress and ``deductions`` adds up the changes those runs returned
+    (values placed by the singles, candidates eliminated by the others). ``limits`` (a limits.Limits) is checked before every rule.
+    """
+
+    def __init__(self, rules=None, stats=None, limits=None):
+        if rules is None:
+            rules = RULES
+        self.rules = []
+        for rule in rules:
+            if callable(rule):
+                self.rules.append((rule.__name__, rule))
+            elif rule in RULES:
+                self.rules.append((rule, RULES[rule]))
+            else:
+                raise ValueError(f"Unknown propagation rule: {rule}")
+        self.stats = stats
+        self.limits = limits
+        self.fired = {name: 0 for name, _ in self.rules}
+        self.deductions = {name: 0 for name, _ in self.rules}
+
+    def propagate(self, state):
+        """Run the rules to a fixpoint; False if the state turns out to have no solution."""
+        start = state.mark()
+        consistent = True
+        try:
+            i = 0
+            while i < len(self.rules):
+                if self.limits is not None:
+                    self.limits.check(self.stats.nodes if self.stats is not None else 0)
+                name, rule = self.rules[i]
+                changed = rule(state)
+                if changed:
+                    self.fired[name] += 1
+                    self.deductions[name] += changed
+                    i = 0
+                else:
+                    i += 1
+        except Contradiction:
+            consistent = False
+        if self.stats is not None:
+            self.stats.values_pruned += sum(1 for _, mask in state.trail[start:] if mask != ASSIGNED)
+            if not consistent:
+                self.stats.wipeouts += 1
+        return consistent
@@ -0,0 +1,114 @@
+"""Mutable search state with a trail of domain changes for cheap backtracking."""
+from grid import NINE
+
+# Trail entry marking an assignment rather than a domain change
+ASSIGNED = -1
+
+
+class SearchState:
+    """Flat board values and bitmask domains of one search, plus a trail for undo.
+
+    Every domain change goes through set_domain and every assignment through
+    assign; both push onto the trail. Backtracking pops the trail back to a
+    mark taken with mark(), so nothing is copied or rebuilt during the search.
+
+    Unassigned cells are also kept in buckets keyed by their number of
+    remaining values, updated on every change, so the most constrained cell
+    is found without scanning the board.
+
+    With track_units, unit_counts[unit * stride + value] holds how many
+    unassigned cells of each unit still allow value, also kept up to date, so
+    LCV can score a value with three lookups.
+
+    geometry is the grid.Geometry of the board (9x9 by default).
+    """
+
+    def __init__(self, domains, values, track_units=False, geometry=NINE):
+        self.geometry = geometry
+        self.popcount = popcount = geometry.popcount
+        self.mask_values = geometry.mask_values
+        self.units_of = geometry.units_of
+        self.stride = geometry.size + 1
+        self.domains = domains
+        self.values = values  # flat board, 0 = empty
+        self.trail = []
+        self.buckets = [set() for _ in range(self.stride)]
+        self.unit_counts = [0] * (len(geometry.units) * self.stride) if track_units else None
+        for index, value in enumerate(values):
+            if value == 0:
+                self.buckets[popcount[domains[index]]].add(index)
+                if track_units:
+                    self.count_values(index, domains[index], 1)
+
+    def count_values(self, index, mask, delta):
+        """Add delta to the unit counts of every value in mask for the cell's three units."""
+        counts = self.unit_counts
+        stride = self.stride
+        for unit in self.units_of[index]:
+            base = unit * stride
+            for value in self.mask_values[mask]:
+                counts[base + value] += delta
+
+    def lcv_score(self, index, value):
+        """How many (row, column, box) peers of the cell still allow value."""
+        counts = self.unit_counts
+        stride = self.stride
+        row, col, box = self.units_of[index]
+        return counts[row * stride + value] + counts[col * stride + value] + counts[box * stride + value] - 3
+
+    def mark(self):
+        return len(self.trail)
+
+    def set_domain(self, index, mask):
+        old = self.domains[index]
+        self.trail.append((index, old))
+        self.domains[index] = mask
+        if not self.values[index]:
+            buckets = self.buckets
+            buckets[self.popcount[old]].discard(index)
+            buckets[self.popcount[mask]].add(index)
+            if self.unit_counts is not None:
+                self.count_values(index, old & ~mask, -1)
+
+    def remove_bit(self, index, bit):
+        """Drop bit from the cell's domain and return the new mask."""
+        mask = self.domains[index] & ~bit
+        self.set_domain(index, mask)
+        return mask
+
+    def assign(self, index, value):
+        self.trail.append((index, ASSIGNED))
+        self.values[index] = value
+        self.buckets[self.popcount[self.domains[index]]].discard(index)
+        if self.unit_counts is not None:
+            self.count_values(index, self.domains[index], -1)
+
+    def undo(self, mark):
+        """Restore every domain and assignment changed since mark."""
+        trail = self.trail
+        domains = self.domains
+        values = self.values
+        buckets = self.buckets
+        popcount = self.popcount
+        track_units = self.unit_counts is not None
+        while len(trail) > mark:
+            index, mask = trail.pop()
+            if mask == ASSIGNED:
+                values[index] = 0
+                buckets[popcount[domains[index]]].add(index)
+                if track_units:
+                    self.count_values(index, domains[index], 1)
+            else:
+                if not values[index]:
+                    buckets[popcount[domains[index]]].discard(index)
+                    buckets[popcount[mask]].add(index)
+                    if track_units:
+                        self.count_values(index, mask & ~domains[index], 1)
+                domains[index] = mask
+
+    def select_mrv(self):
+        """Unassigned cell with the fewest remaining values, or None when the board is full."""
+        for bucket in self.buckets:
+            if bucket:
+                return next(iter(bucket))
+        return None
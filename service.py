@@ -0,0 +1,375 @@
+"""Local HTTP/JSON solve service: a bounded queue in front of a warm process pool.
+
+    POST /solve     {"puzzle": "...", "strategy": "DLX", "timeout": 5}
+    POST /unique    {"puzzle": "..."}
+    POST /generate  {"removals": 50, "box_size": 3, "seed": 7}   (or "grade": "hard" for removals)
+    POST /hint      {"puzzle": "..."}
+    GET  /metrics
+
+Puzzles are lines as in cli.py solve (81, 256 or 625 characters). Every
+request has a deadline (its "timeout" in seconds, capped by the server's);
+one still queued at its deadline is dropped without running, and a running
+search is handed the time left as a limits.Limits, so it stops and frees its
+worker. Either way the answer is 504. When the queue is full new requests
+are refused with 503 instead of piling up.
+Identical solve, unique and hint requests in flight at the same time share
+one job.
+
+Workers are started once, with the solver modules imported and the 9x9
+tables built, so a request pays for its search and nothing else.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cache
+import dlx
+import generator
+import grader
+import solver
+from grid import format_board, parse_board
+from limits import BUDGET_EXHAUSTED, CANCELLED, TIMED_OUT, Limits, SearchAborted
+
+ENDPOINTS = ("solve", "unique", "generate", "hint")
+# Latencies kept per endpoint for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+# Largest request body accepted, in bytes
+MAX_BODY = 64 * 1024
+
+
+class RequestError(Exception):
+    """A request the service answers with an HTTP error status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _warm_worker(cache_path):
+    """Pool initializer: build the tables and caches a worker's first request would otherwise pay for."""
+    cache.init_process_cache(cache_path)
+    solver.solve(generator.generate_solution(random.Random(0)), "DLX")
+
+
+# The jobs below run in the workers. Each gets the seconds left before its
+# deadline; a search that runs out of them raises SearchAborted or returns
+# its status, and the dispatcher answers 504.
+
+def _solve_job(line, strategy, timeout):
+    board = parse_board(line)
+    limits = Limits(timeout)
+    result = cache.solve(board, strategy, limits)
+    return {"solved": result.solved, "status": result.status, "stats": result.stats.as_dict(),
+            "solution": format_board(result.board) if result.solved else None}
+
+
+def _unique_job(line, timeout):
+    count = solver.count_solutions(parse_board(line), 2, limits=Limits(timeout))
+    return {"solutions": count, "unique": count == 1}
+
+
+def _generate_job(removals, box, seed, grade, timeout):
+    rng = random.Random(seed)
+    puzzle, solution = generator.make_puzzle(removals, rng, box, Limits(timeout), grade)
+    result = grader.grade(puzzle)
+    return {"puzzle": format_board(puzzle), "solution": format_board(solution), "grade": result.grade,
+            "hardest": result.hardest, "steps": result.steps}
+
+
+def _hint_job(line, timeout):
+    """The value of the empty cell with the fewest candidates, taken from the solution."""
+    board = parse_board(line)
+    solution = dlx.solve(board, limits=Limits(timeout))
+    if solution is None:
+        return {"solved": False}
+    state = solver.SudokuSolver(board, "MRV")
+    state.initialize_domains()
+    index = state.find_empty_mrv()
+    if index is None:
+        return {"solved": True, "hint": None}
+    row, col = state.geometry.pos(index)
+    return {"solved": True, "hint": {"row": row, "col": col, "value": solution[row][col]}}
+
+
+class Job:
+    """One unit of work for the pool, shared by every request coalesced onto it."""
+
+    def __init__(self, kind, function, args, deadline, future):
+        self.kind = kind
+        self.function = function
+        self.args = args
+        self.deadline = deadline
+        self.future = future
+        self.started = False  # Once dispatched, the worker's limit is fixed
+
+
+class ServiceMetrics:
+    """Request counters, queue depth and the latencies of recent completed requests per endpoint."""
+
+    def __init__(self):
+        self.counts = {}
+        self.latencies = {}
+        self.max_queue_depth = 0
+        self.started = time.time()
+
+    def count(self, kind, event):
+        key = (kind, event)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def record(self, kind, seconds):
+        self.latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def as_dict(self, queue_depth, in_flight):
+        endpoints = {}
+        for (kind, event), count in self.counts.items():
+            endpoints.setdefault(kind, {})[event] = count
+        for kind, window in self.latencies.items():
+            ordered = sorted(window)
+            endpoints.setdefault(kind, {})["latency_ms"] = {
+                name: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)
+                for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))}
+        return {"uptime": round(time.time() - self.started, 1), "queue_depth": queue_depth,
+                "max_queue_depth": self.max_queue_depth, "in_flight": in_flight, "endpoints": endpoints}
+
+
+class SolveService:
+    """Queue, coalescing and deadlines in the event loop; the searches run in a process pool."""
+
+    def __init__(self, workers=None, queue_size=64, timeout=10.0, cache_path=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.queue = asyncio.Queue(queue_size)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_warm_worker, initargs=(cache_path,))
+        self.in_flight = {}  # Coalescing key -> queued or running Job
+        self.running = 0
+        self.metrics = ServiceMetrics()
+        self.dispatchers = []
+
+    async def start(self):
+        """Start the workers and the dispatchers; call before accepting connections.
+
+        The pool forks its workers on first use, and a worker forked while a
+        client connection is open would hold that socket open after we close it.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, int) for _ in range(self.workers)))
+        # One dispatcher per worker, so jobs wait in the bounded queue rather than inside the pool
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self.dispatchers:
+            task.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                remaining = job.deadline - loop.time()
+                if job.future.done():
+                    continue
+                if remaining <= 0:
+                    self.metrics.count(job.kind, "expired")
+                    job.future.set_exception(RequestError(504, "Deadline passed while queued"))
+                    continue
+                job.started = True
+                self.running += 1
+                try:
+                    # A little grace on top of the search's own limit, for the round trip to the worker
+                    result = await asyncio.wait_for(
+                        loop.run_in_executor(self.pool, job.function, *job.args, remaining), remaining + 1.0)
+                    if result.get("status") in (TIMED_OUT, BUDGET_EXHAUSTED, CANCELLED):
+                        raise SearchAborted(result["status"])
+                except (asyncio.TimeoutError, SearchAborted):
+                    self.metrics.count(job.kind, "overran")
+                    job.future.set_exception(RequestError(504, "Deadline exceeded"))
+                except Exception as e:
+                    logging.error(f"{job.kind} job failed: {e}")
+                    job.future.set_exception(RequestError(500, str(e)))
+                else:
+                    job.future.set_result(result)
+                finally:
+                    self.running -= 1
+            finally:
+                self.queue.task_done()
+
+    def job_for(self, kind, params):
+        """(coalescing key or None, function, args) for a request, validating its parameters."""
+        if kind in ("solve", "unique", "hint"):
+            line = params.get("puzzle")
+            try:
+                line = format_board(parse_board(line))
+            except (AttributeError, ValueError) as e:
+                raise RequestError(400, f"Bad puzzle: {e}")
+            if kind == "solve":
+                strategy = params.get("strategy", "DLX")
+                if strategy not in solver.HEURISTICS:
+                    raise RequestError(400, f"Unknown strategy: {strategy}")
+                return (kind, line, strategy), _solve_job, (line, strategy)
+            return (kind, line), _unique_job if kind == "unique" else _hint_job, (line,)
+        if kind == "generate":
+            box = int_param(params, "box_size", 3)
+            removals = int_param(params, "removals", 50)
+            seed = int_param(params, "seed", None)
+            if seed is None:
+                seed = random.randrange(2 ** 32)
+            grade = params.get("grade")
+            if box not in (3, 4, 5) or not 0 <= removals < box ** 4:
+                raise RequestError(400, "box_size must be 3, 4 or 5 and removals less than the cell count")
+            if grade is not None and grade not in grader.GRADES:
+                raise RequestError(400, f"grade must be one of {', '.join(grader.GRADES)}")
+            # Seeded requests give the same puzzle, so they can share a job too
+            key = (kind, box, removals, seed, grade) if "seed" in params else None
+            return key, _generate_job, (removals, box, seed, grade)
+        raise RequestError(404, f"Unknown endpoint: /{kind}")
+
+    async def submit(self, kind, params):
+        """Run one request through the queue and return its JSON result (raises RequestError)."""
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        self.metrics.count(kind, "requests")
+        try:
+            key, function, args = self.job_for(kind, params)
+            timeout = params.get("timeout", self.timeout)
+            if isinstance(timeout, bool) or not isinstance(timeout, (int, float)):
+                raise RequestError(400, "timeout must be a number of seconds")
+            # json.loads accepts NaN and Infinity; a NaN deadline would never expire in the worker
+            if not math.isfinite(timeout) or timeout <= 0:
+                raise RequestError(400, "timeout must be a positive number of seconds")
+            timeout = min(timeout, self.timeout)
+            deadline = loop.time() + timeout
+            job = self.in_flight.get(key) if key is not None else None
+            # A running job stops at its own deadline, so a later one gets a job of its own
+            if job is not None and job.started and job.deadline < deadline:
+                job = None
+            if job is not None:
+                self.metrics.count(kind, "coalesced")
+                job.deadline = max(job.deadline, deadline)
+            else:
+                job = Job(kind, function, args, deadline, loop.create_future())
+                try:
+                    self.queue.put_nowait(job)
+                except asyncio.QueueFull:
+                    self.metrics.count(kind, "rejected")
+                    raise RequestError(503, "Queue full, try again later")
+                self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.queue.qsize())
+                if key is not None:
+                    self.in_flight[key] = job
+                    job.future.add_done_callback(
+                        lambda future, job=job: self.in_flight.get(key) is job and self.in_flight.pop(key))
+                # Mark the outcome retrieved, in case every waiter has given up on it
+                job.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+            try:
+                result = await asyncio.wait_for(asyncio.shield(job.future), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                self.metrics.count(kind, "timeouts")
+                raise RequestError(504, "Deadline exceeded")
+            self.metrics.count(kind, "completed")
+            self.metrics.record(kind, time.perf_counter() - start_time)
+            return result
+        except RequestError as e:
+            self.metrics.count(kind, f"status_{e.status}")
+            raise
+
+    def metrics_snapshot(self):
+        return self.metrics.as_dict(self.queue.qsize(), self.running)
+
+    async def handle_connection(self, reader, writer):
+        """Serve one HTTP/1.1 request and close the connection."""
+        status, body = 200, None
+        try:
+            method, path, params = await read_request(reader)
+            kind = path.strip("/")
+            if method == "GET" and kind == "metrics":
+                body = self.metrics_snapshot()
+            elif kind not in ENDPOINTS:
+                raise RequestError(404, f"Unknown endpoint: {path}")
+            elif method != "POST":
+                raise RequestError(405, "Use POST, or GET /metrics")
+            else:
+                body = await self.submit(kind, params)
+        except RequestError as e:
+            status, body = e.status, {"error": str(e)}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        try:
+            writer.write(http_response(status, body))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+           504: "Gateway Timeout"}
+
+
+async def read_request(reader):
+    """(method, path, JSON parameters) of one HTTP request."""
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise RequestError(400, "Malformed request line")
+    method, path, _ = request_line
+    length = 0
+    while True:
+        header = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        if name.strip().lower() == "content-length":
+            try:
+                length = int(value)
+            except ValueError:
+                raise RequestError(400, "Bad Content-Length")
+    if length > MAX_BODY:
+        raise RequestError(413, "Request body too large")
+    params = {}
+    if length:
+        try:
+            params = json.loads(await reader.readexactly(length))
+        except ValueError:
+            raise RequestError(400, "Body is not valid JSON")
+        if not isinstance(params, dict):
+            raise RequestError(400, "Body must be a JSON object")
+    return method, path.split("?")[0], params
+
+
+def int_param(params, name, default):
+    """An integer request parameter; JSON floats, strings and booleans are rejected with a 400."""
+    if name not in params:
+        return default
+    value = params[name]
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RequestError(400, f"{name} must be an integer")
+    return value
+
+
+def http_response(status, body):
+    payload = json.dumps(body).encode()
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n")
+    return head.encode() + payload
+
+
+async def serve(host="127.0.0.1", port=8765, workers=None, queue_size=64, timeout=10.0, cache_path=None):
+    """Run the service until cancelled."""
+    service = SolveService(workers, queue_size, timeout, cache_path)
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    logging.info(f"Serving on http://{host}:{port} with {service.workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
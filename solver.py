@@ -0,0 +1,384 @@
+"""Headless Sudoku search engine shared by the GUI and the batch tools."""
+import time
+
+import Arc_Consistency
+import dlx
+from domains import value_bit
+from grid import board_geometry
+from limits import SearchAborted
+from metrics import SearchStats
+from propagation import Propagator
+from search_state import ASSIGNED, SearchState
+from tracing import FULL, SUMMARY, as_trace
+
+HEURISTICS = ("MRV", "Forward Checking", "LCV", "ALL", "AC-3", "GAC", "Propagation", "DLX")
+
+# Strategies that reject an assignment as soon as it wipes out a peer's domain
+FORWARD_CHECKING = ("Forward Checking", "ALL", "AC-3", "GAC", "Propagation")
+# Strategies that run the propagation rules to a fixpoint at every node
+PROPAGATION = ("Propagation",)
+# Strategies that order values least-constraining first
+LCV_ORDER = ("LCV", "ALL", "AC-3", "GAC")
+
+# Strategy used when none is chosen, by box size: the plain backtrackers can run for
+# millions of nodes on 16x16 and 25x25 boards that exact cover solves in milliseconds
+DEFAULT_HEURISTICS = {3: "ALL", 4: "DLX", 5: "DLX"}
+
+# SolveResult statuses besides the limits.SearchAborted ones
+SOLVED = "solved"
+NO_SOLUTION = "no solution"
+
+
+class SolveResult:
+    """Outcome of a solve: the final board, whether it is solved and the stats.
+
+    status is SOLVED, NO_SOLUTION, or the limits status (timed out, budget
+    exhausted, cancelled) of a search stopped early, whose board is the
+    unsolved input and whose stats cover the work done until it stopped.
+    """
+
+    def __init__(self, solved, board, stats, heuristic, status=None):
+        self.solved = solved
+        self.board = board
+        self.stats = stats
+        self.heuristic = heuristic
+        self.status = status or (SOLVED if solved else NO_SOLUTION)
+
+    def __bool__(self):
+        return self.solved
+
+
+class SudokuSolver:
+    """Backtracking search over a plain n² x n² board (0 = empty), 9x9 by default.
+
+    Every strategy keeps the candidate masks of empty cells up to date in a
+    SearchState, so MRV selection is a bucket lookup; the strategies differ in
+    whether they fail fast on a wipe-out and how they order values.
+
+    ``on_step`` is an optional callback ``on_step(event, (row, col), value)``
+    invoked with ``"assign"`` and ``"unassign"`` events, so a front end can
+    follow the search without the search knowing about it. ``trace`` is a
+    tracing.TraceSink or level name; tracing is off unless asked for. A dict
+    passed as ``arc_tree`` is filled by the AC-3 pre-pass for diagnostics.
+    With an ``rng``, values are tried in random order (used to generate boards).
+    ``rules`` picks the propagation.RULES used by the "Propagation" strategy
+    (all of them by default). ``limits`` is a limits.Limits checked at every
+    node; the searches raise limits.SearchAborted when it is hit.
+    """
+
+    def __init__(self, board, heuristic="MRV", on_step=None, trace=None, arc_tree=None, rng=None,
+                 rules=None, limits=None):
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Unknown heuristic: {heuristic}")
+        self.board = [list(row) for row in board]
+        self.geometry = board_geometry(self.board)
+        self.size = self.geometry.size
+        self.heuristic = heuristic
+        self.on_step = on_step
+        self.trace = as_trace(trace)
+        self.trace_full = self.trace.enabled(FULL)
+        self.arc_tree = arc_tree
+        self.rng = rng
+        self.domains = None
+        self.state = None
+        self.stats = SearchStats()
+        self.limits = limits
+        self.propagator = Propagator(rules, self.stats, limits) if heuristic in PROPAGATION else None
+
+    def is_valid(self, num, pos):
+        """Check if placing num at pos is valid."""
+        row, col = pos
+        size, box = self.size, self.geometry.box
+        for j in range(size):
+            if self.board[row][j] == num and col != j:
+                return False
+        for i in range(size):
+            if self.board[i][col] == num and row != i:
+                return False
+        box_x = col // box
+        box_y = row // box
+        for i in range(box_y * box, box_y * box + box):
+            for j in range(box_x * box, box_x * box + box):
+                if self.board[i][j] == num and (i, j) != pos:
+                    return False
+        return True
+
+    def unit_masks(self):
+        """Bitmask of the values placed in each unit, or None if the givens clash."""
+        units_of = self.geometry.units_of
+        used = [0] * len(self.geometry.units)
+        for index, value in enumerate(value for row in self.board for value in row):
+            if value:
+                if not 1 <= value <= self.size:
+                    return None
+                bit = value_bit(value)
+                for unit in units_of[index]:
+                    if used[unit] & bit:
+                        return None
+                    used[unit] |= bit
+        return used
+
+    def is_consistent(self):
+        """Check that the givens do not already clash with each other."""
+        return self.unit_masks() is not None
+
+    def get_possible_values(self, pos):
+        """Return list of valid values for a given position."""
+        if self.board[pos[0]][pos[1]] != 0:
+            return []
+        return [num for num in range(1, self.size + 1) if self.is_valid(num, pos)]
+
+    def initialize_domains(self, domains=None):
+        """Set up bitmask domains (flat, indexed row * size + col) and the search state."""
+        values = [value for row in self.board for value in row]
+        if domains is None:
+            all_values = self.geometry.all_values
+            used = self.unit_masks() or [0] * len(self.geometry.units)
+            domains = [value_bit(value) if value else
+                       all_values & ~(used[row] | used[col] | used[box])
+                       for value, (row, col, box) in zip(values, self.geometry.units_of)]
+        self.state = SearchState(domains, values, track_units=self.heuristic in LCV_ORDER,
+                                 geometry=self.geometry)
+        self.domains = self.state.domains
+
+    def find_empty_mrv(self):
+        """Index of the empty cell with the minimum remaining values (MRV), None if the board is full."""
+        return self.state.select_mrv()
+
+    def get_lcv_values(self, index):
+        """Sort the values of cell index based on Least Constraining Value (LCV).
+
+        A value's cost is the number of row, column and box peers that still
+        allow it, read from the state's per-unit count tables.
+        """
+        lcv_score = self.state.lcv_score
+        value_counts = [(lcv_score(index, num), num) for num in self.geometry.mask_values[self.domains[index]]]
+        value_counts.sort()
+        return [num for _, num in value_counts]
+
+    def update_domains(self, index, value, fail_fast=True):
+        """Remove value from the domains of the cell's empty peers, recording each pruning on the trail.
+
+        Only the cells actually pruned can be wiped out, so they are checked as
+        they are pruned; with fail_fast, returns False on the first empty
+        domain. The caller undoes the pruning with state.undo(mark) either way.
+        """
+        bit = value_bit(value)
+        domains = self.domains
+        values = self.state.values
+        remove_bit = self.state.remove_bit
+        start = self.state.mark()
+        consistent = True
+        for k in self.geometry.peers[index]:
+            if domains[k] & bit and values[k] == 0:
+                if not remove_bit(k, bit):
+                    consistent = False
+                    if fail_fast:
+                        break
+        self.stats.values_pruned += self.state.mark() - start
+        if not consistent:
+            self.stats.wipeouts += 1
+        return consistent
+
+    def ordered_values(self, index):
+        """Values to try at cell index, in the order the selected heuristic wants them."""
+        mask_values = self.geometry.mask_values
+        if self.rng is not None:
+            values = list(mask_values[self.domains[index]])
+            self.rng.shuffle(values)
+            return values
+        if self.heuristic in LCV_ORDER:
+            return self.get_lcv_values(index)
+        return mask_values[self.domains[index]]
+
+    def propagate(self):
+        """Run the propagation rules, if this strategy uses them; False on a contradiction.
+
+        Cells placed by the rules are reported to on_step as assignments.
+        Returns (consistent, [(cell, value)] placed) so the caller can report
+        them as unassigned again when it backtracks.
+        """
+        if self.propagator is None:
+            return True, ()
+        start = self.state.mark()
+        if not self.propagator.propagate(self.state):
+            return False, ()
+        if not self.on_step:
+            return True, ()
+        values = self.state.values
+        placed = [(self.geometry.pos(index), values[index]) for index, mask in self.state.trail[start:]
+                  if mask == ASSIGNED]
+        for cell, value in placed:
+            self.on_step("assign", cell, value)
+        return True, placed
+
+    def search(self, depth=0):
+        """Recursive backtracking; returns True once the board is complete."""
+        index = self.find_empty_mrv()
+        if index is None:
+            return True
+        self.stats.nodes += 1
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        if self.limits is not None:
+            self.limits.check(self.stats.nodes)
+        cell = row, col = self.geometry.pos(index)
+        state = self.state
+        forward_checking = self.heuristic in FORWARD_CHECKING
+
+        for num in self.ordered_values(index):
+            mark = state.mark()
+            state.assign(index, num)
+            if not self.update_domains(index, num, forward_checking) and forward_checking:
+                state.undo(mark)
+                continue
+
+            self.stats.assignments += 1
+            if self.trace_full:
+                self.trace.write(f"Assigning value {num} to cell ({row},{col})\n")
+            if self.on_step:
+                self.on_step("assign", cell, num)
+
+            consistent, placed = self.propagate()
+            if consistent and self.search(depth + 1):
+                return True
+
+            state.undo(mark)
+            self.stats.backtracks += 1
+            if self.trace_full:
+                self.trace.write(f"Backtracking from cell ({row},{col}), value {num}\n")
+            if self.on_step:
+                for forced_cell, forced_num in reversed(placed):
+                    self.on_step("unassign", forced_cell, forced_num)
+                self.on_step("unassign", cell, num)
+
+        return False
+
+    def count_solutions(self, limit, depth=0):
+        """Count completions of the current state with forward checking, stopping at limit."""
+        index = self.find_empty_mrv()
+        if index is None:
+            return 1
+        self.stats.nodes += 1
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        if self.limits is not None:
+            self.limits.check(self.stats.nodes)
+        state = self.state
+        found = 0
+        for num in self.geometry.mask_values[self.domains[index]]:
+            mark = state.mark()
+            state.assign(index, num)
+            if self.update_domains(index, num):
+                found += self.count_solutions(limit - found, depth + 1)
+            state.undo(mark)
+            if found >= limit:
+                break
+        return found
+
+    def prepare_ac3(self):
+        """Run the AC-3 pre-pass and load its pruned domains; False on wipe-out."""
+        masks = Arc_Consistency.initialize_bit_domains(self.board)
+        pruned = Arc_Consistency.ac3(self.board, masks, Arc_Consistency.define_arcs(self.board),
+                                     trace=self.trace, arc_tree=self.arc_tree, stats=self.stats,
+                                     limits=self.limits)
+        if not pruned:
+            return False
+        self.initialize_domains([mask for row in pruned for mask in row])
+        return True
+
+    def prepare_gac(self):
+        """Run the all-different GAC pre-pass and load its pruned domains; False on wipe-out."""
+        masks = Arc_Consistency.initialize_bit_domains(self.board)
+        pruned = Arc_Consistency.gac(self.board, masks, trace=self.trace, stats=self.stats, limits=self.limits)
+        if not pruned:
+            return False
+        self.initialize_domains([mask for row in pruned for mask in row])
+        return True
+
+    def solve(self):
+        """Solve the board in place and return a SolveResult.
+
+        A search stopped by its limits leaves the board as it was and returns
+        the limits status, with the stats gathered up to that point.
+        """
+        start_time = time.perf_counter()
+        solved = False
+        status = None
+        search_start = None
+        try:
+            if self.heuristic == "DLX":
+                # Exact cover has its own matrix and search; it shares only the stats, on_step and limits
+                search_start = start_time
+                links = dlx.DancingLinks(self.board, self.on_step, self.stats, self.limits)
+                solved = links.count(1) == 1
+                if solved:
+                    self.board = links.board()
+            elif self.is_consistent():
+                if self.heuristic in ("AC-3", "GAC"):
+                    ready = self.prepare_ac3() if self.heuristic == "AC-3" else self.prepare_gac()
+                    self.stats.ac3_time = time.perf_counter() - start_time
+                else:
+                    self.initialize_domains()
+                    ready, _ = self.propagate()
+                if ready:
+                    search_start = time.perf_counter()
+                    solved = self.search()
+                if solved:
+                    values = self.state.values
+                    size = self.size
+                    self.board = [values[r * size:r * size + size] for r in range(size)]
+        except SearchAborted as e:
+            status = e.status
+        end_time = time.perf_counter()
+        if search_start is not None:
+            self.stats.search_time = end_time - search_start
+        elif status is not None and self.heuristic in ("AC-3", "GAC"):
+            # Stopped during the pre-pass
+            self.stats.ac3_time = end_time - start_time
+        self.stats.elapsed = end_time - start_time
+        result = SolveResult(solved, self.board, self.stats, self.heuristic, status)
+        if self.trace.enabled(SUMMARY):
+            self.trace.write(self.stats.to_json(heuristic=self.heuristic, solved=solved, status=result.status)
+                             + "\n")
+        self.trace.flush()
+        return result
+
+
+def default_heuristic(board):
+    """The strategy for board when none is chosen (see DEFAULT_HEURISTICS)."""
+    return DEFAULT_HEURISTICS.get(board_geometry(board).box, "DLX")
+
+
+def solve(board, heuristic="MRV", on_step=None, trace=None, arc_tree=None, rules=None, limits=None):
+    """Solve a copy of board with the given heuristic and return a SolveResult.
+
+    With limits (a limits.Limits), a search that runs out of time or nodes, or
+    is cancelled, returns a SolveResult with that status instead of running on.
+    """
+    return SudokuSolver(board, heuristic, on_step, trace, arc_tree, rules=rules, limits=limits).solve()
+
+
+def count_solutions(board, limit=2, stats=None, backend="DLX", limits=None):
+    """Number of solutions of board, counting stops as soon as limit is reached.
+
+    Pass a SearchStats as stats to have the counter's work recorded in it.
+    The exact-cover backend is the default; any other backend name counts
+    with the forward-checking backtracker. With limits, raises
+    limits.SearchAborted when they are hit rather than return a count that
+    is cut short; stats then holds the partial counts (see limits.py).
+    """
+    if backend == "DLX":
+        return dlx.count_solutions(board, limit, stats, limits)
+    counter = SudokuSolver(board, "Forward Checking", limits=limits)
+    if stats is not None:
+        counter.stats = stats
+    if not counter.is_consistent():
+        return 0
+    counter.initialize_domains()
+    return counter.count_solutions(limit)
+
+
+def has_unique_solution(board, backend="DLX", limits=None):
+    """Whether board has exactly one solution; raises limits.SearchAborted as count_solutions does."""
+    return count_solutions(board, 2, backend=backend, limits=limits) == 1
@@ -0,0 +1,81 @@
+import random
+from multiprocessing import Pool
+
+import solver
+from cache import DiskTier, SolutionCache, apply_transform, canonical_form, invert_transform
+from grid import format_board, parse_board
+
+PUZZLE = parse_board("003020600900305001001806400008102900700000008006708200002609500800203009005010300")
+
+
+def variant(board, rng):
+    """A random relabelled, row/column/band/stack-swapped and maybe transposed copy of board."""
+    def line_order():
+        bands = rng.sample(range(3), 3)
+        return [band * 3 + k for band in bands for k in rng.sample(range(3), 3)]
+
+    digits = [0] + rng.sample(range(1, 10), 9)
+    rows, cols = line_order(), line_order()
+    moved = [[digits[board[r][c]] for c in cols] for r in rows]
+    if rng.random() < 0.5:
+        moved = [list(column) for column in zip(*moved)]
+    return moved
+
+
+def test_transform_round_trip():
+    rng = random.Random(1)
+    key, _ = canonical_form(PUZZLE)
+    for _ in range(20):
+        board = variant(PUZZLE, rng)
+        variant_key, transform = canonical_form(board)
+        assert variant_key == key
+        assert apply_transform(board, transform) == key
+        assert invert_transform(variant_key, transform) == board
+
+
+def test_symmetric_variant_answered_from_cache():
+    cache = SolutionCache()
+    cache.solve(PUZZLE)
+    board = variant(PUZZLE, random.Random(2))
+    solution = cache.get(board)
+    assert solution is not None and cache.hits == 1
+    assert format_board(solution) == format_board(solver.solve(board, "DLX").board)
+
+
+def _record(writer, i):
+    key = f"{writer:02d}{i:079d}"
+    return key, key[::-1]
+
+
+def _append_records(task):
+    """Put records from one process into the shared file; return how many read back wrong."""
+    path, writer, count = task
+    disk = DiskTier(path)
+    for i in range(count):
+        disk.put(*_record(writer, i))
+    wrong = sum(disk.get(key) != solution for key, solution in (_record(writer, i) for i in range(count)))
+    disk.close()
+    return wrong
+
+
+def test_disk_tier_shared_by_processes(tmp_path):
+    path = str(tmp_path / "solutions.bin")
+    writers, count = 8, 2000
+    with Pool(writers) as pool:
+        assert pool.map(_append_records, [(path, writer, count) for writer in range(writers)]) == [0] * writers
+    disk = DiskTier(path)
+    assert len(disk.index) == writers * count
+    assert all(disk.get(key) == solution
+               for writer in range(writers) for key, solution in (_record(writer, i) for i in range(count)))
+    disk.close()
+
+
+def test_disk_tier_rejects_record_of_another_key(tmp_path):
+    disk = DiskTier(str(tmp_path / "solutions.bin"))
+    first, second = _record(0, 1), _record(0, 2)
+    disk.put(*first)
+    disk.put(*second)
+    disk.index[first[0]] = disk.index[second[0]]
+    assert disk.get(first[0]) is None
+    assert disk.get(second[0]) == second[1]
+    disk.close()
@@ -0,0 +1,61 @@
+"""Opt-in, buffered trace output for the solver and AC-3.
+
+Levels: ``off`` writes nothing, ``summary`` writes one line per run and
+``full`` writes every revision / assignment. Text is collected in memory
+and written to the file in chunks, never once per event.
+"""
+import sys
+
+OFF = 0
+SUMMARY = 1
+FULL = 2
+LEVELS = {"off": OFF, "summary": SUMMARY, "full": FULL}
+
+
+class TraceSink:
+    def __init__(self, level="off", filename="log.txt", buffer_size=1 << 16, echo=False):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self.echo = echo  # also print to stdout, as the GUI used to
+        self.buffer = []
+        self.buffered = 0
+
+    def enabled(self, level=SUMMARY):
+        return self.level >= level
+
+    def write(self, text):
+        if not self.level:
+            return
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        if self.filename:
+            with open(self.filename, "a") as f:
+                f.write(text)
+        if self.echo:
+            sys.stdout.write(text)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def as_trace(trace, filename="log.txt"):
+    """Accept a TraceSink, a level name/number or None (off)."""
+    if isinstance(trace, TraceSink):
+        return trace
+    return TraceSink(trace or OFF, filename)